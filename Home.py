@@ -1,5 +1,6 @@
 import streamlit as st
 from PIL import Image
+from dashboard import warmup
 
 st.set_page_config(
     page_title='Home',
@@ -15,6 +16,11 @@ st.sidebar.markdown( '# Cury Company' )
 st.sidebar.markdown( '## Fastest Delivery in Town' )
 st.sidebar.markdown( """---""" )
 
+# começa a pré-calcular o dataset e as visões padrão enquanto o usuário lê a página inicial
+warmup_message = warmup.progress_message( warmup.start() )
+if warmup_message:
+    st.sidebar.caption( warmup_message )
+
 st.write( '# Curry Company Growth Dashboard' )
 
 st.markdown("""
@@ -0,0 +1 @@
+# gerador de dados sintéticos e benchmark das etapas do dashboard
@@ -0,0 +1,235 @@
+# libraries
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import resource
+import subprocess
+import tracemalloc
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import write_csv
+from dashboard import data, figures, metrics
+from dashboard.couriers import load_profile_table
+from dashboard.cube import build_cube, load_cube, merge_cubes
+from dashboard.geo import add_distance
+from dashboard.buckets import add_time_keys
+from dashboard.index import build_row_index, filter_rows
+from dashboard.parallel import aggregate, worker_count
+from dashboard.server import VIEWS, Query
+from dashboard.sketch import build_sketches, load_sketches, merge_sketches
+
+
+# tamanhos padrão (linhas do csv sintético)
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+
+# filtros usados nas etapas de filtro e de visões: padrão da barra lateral e um recorte estreito
+FILTERS = { 'default': ( datetime( 2022, 4, 13 ), ['Low', 'Medium', 'High', 'Jam'] ),
+            'narrow': ( datetime( 2022, 3, 1 ), ['Jam'] ) }
+
+# figuras das páginas (dashboard.figures) medidas a partir das células do cubo e dos períodos
+CELL_FIGURES = ['order_metric', 'traffic_order_share', 'traffic_order_city',
+                'avg_std_time_graph', 'avg_std_time_on_traffic', 'distance']
+BUCKET_FIGURES = ['order_by_week', 'order_share_by_week']
+
+RESULTS_DIR = os.path.join( os.path.dirname( __file__ ), 'results' )
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def measure( stages, name, fn, *args, track_memory=True ):
+    """ Executa fn( *args ) guardando em stages o tempo (s) e o pico de memória alocada (MB)
+
+        Input: dicionário de resultados, nome da etapa, função e argumentos
+        Output: resultado de fn
+    """
+    if track_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    result = fn( *args )
+    elapsed = time.perf_counter() - start
+
+    stages[name] = { 'seconds': round( elapsed, 6 ) }
+    if track_memory:
+        stages[name]['peak_mb'] = round( tracemalloc.get_traced_memory()[1] / 2**20, 3 )
+        tracemalloc.stop()
+
+    return result
+
+
+def run_size( rows, seed=0, track_memory=True ):
+    """ Mede todas as etapas do dashboard para um csv sintético com rows pedidos
+
+        Etapas: geração, leitura do csv, limpeza, schema, carga completa sem e
+        com cache em disco, cubo, índice de linhas, sketches (também em
+        paralelo com CURRY_WORKERS > 1), tabela de perfis dos entregadores,
+        filtros, cada visão de dashboard.server.VIEWS e cada figura de
+        dashboard.figures (com os filtros de FILTERS).
+
+        Input: quantidade de linhas, semente, medir memória (tracemalloc)
+        Output: dicionário etapa -> { 'seconds', 'peak_mb' }
+    """
+    stages = {}
+    folder = tempfile.mkdtemp( prefix='curry-bench-' )
+    path = os.path.join( folder, 'train.csv' )
+
+    try:
+        measure( stages, 'generate', write_csv, path, rows, seed, track_memory=False )
+
+        raw = measure( stages, 'read_csv', pd.read_csv, path, track_memory=track_memory )
+        df1 = measure( stages, 'clean', data.clean_code, raw, track_memory=track_memory )
+        measure( stages, 'schema', lambda df: data.apply_schema( add_time_keys( add_distance( df ) ) ), df1,
+                 track_memory=track_memory )
+        del raw, df1
+
+        measure( stages, 'load_cold', data.build_dataset, path, track_memory=track_memory )
+        df1 = measure( stages, 'load_cached', data.build_dataset, path, track_memory=track_memory )
+
+        measure( stages, 'cube', build_cube, df1, track_memory=track_memory )
+        index = measure( stages, 'row_index', build_row_index, df1, track_memory=track_memory )
+        measure( stages, 'sketches', build_sketches, df1, track_memory=track_memory )
+
+        # com CURRY_WORKERS > 1, as mesmas agregações particionadas no pool de processos
+        # (tracemalloc só enxerga a memória deste processo)
+        if worker_count() > 1:
+            measure( stages, 'cube/parallel', aggregate, build_cube, merge_cubes, df1, track_memory=track_memory )
+            measure( stages, 'sketches/parallel', aggregate, build_sketches, merge_sketches, df1,
+                     track_memory=track_memory )
+
+        # como no dashboard depois do pré-cálculo: os valores guardados por processo já existem,
+        # então a primeira construção do cubo e dos sketches não entra no tempo da primeira visão
+        data.load_dataset( path )
+        load_cube( path )
+        load_sketches( path )
+        measure( stages, 'load_profile_table', load_profile_table, path, track_memory=track_memory )
+
+        for label, ( date_limit, traffic_options ) in FILTERS.items():
+            measure( stages, 'filter_rows/' + label, filter_rows, df1, index, date_limit, traffic_options,
+                     track_memory=track_memory )
+
+            df_view, cells = metrics.load_view( date_limit, traffic_options, path )
+            for name, ( view, needs_rows ) in VIEWS.items():
+                if needs_rows and df_view is None:
+                    continue
+                query = Query( df_view, cells, date_limit, traffic_options, 'Semana', 10, path )
+                measure( stages, 'view/{}/{}'.format( name, label ), view, query, track_memory=track_memory )
+
+            df_buckets = metrics.orders_by_period( cells, df_view, date_limit, traffic_options, 'Semana', path )
+            for name in CELL_FIGURES:
+                measure( stages, 'figure/{}/{}'.format( name, label ), getattr( figures, name ), cells,
+                         track_memory=track_memory )
+            for name in BUCKET_FIGURES:
+                measure( stages, 'figure/{}/{}'.format( name, label ), getattr( figures, name ), df_buckets,
+                         track_memory=track_memory )
+
+            # mapas (precisam das linhas), até o HTML que o folium_static envia; a etapa leva
+            # a última palavra do modo (ex.: figure/country_maps/grade)
+            if df_view is not None:
+                for mode in figures.MAP_MODES:
+                    measure( stages, 'figure/country_maps/{}/{}'.format( mode.split()[-1].lower(), label ),
+                             lambda df, m: figures.country_maps( df, m ).get_root().render(), df_view, mode,
+                             track_memory=track_memory )
+
+    finally:
+        data.forget( path )
+        shutil.rmtree( folder, ignore_errors=True )
+
+    return stages
+
+
+def git_commit():
+    """ Commit atual do repositório, ou None fora de um checkout git """
+    try:
+        return subprocess.run( ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                               cwd=os.path.dirname( os.path.abspath( __file__ ) ), check=True ).stdout.strip()
+    except ( OSError, subprocess.CalledProcessError ):
+        return None
+
+
+def run( sizes, seed=0, track_memory=True ):
+    """ Executa o benchmark para cada tamanho e devolve o relatório completo (pronto para JSON) """
+    report = { 'commit': git_commit(),
+               'created': datetime.now().isoformat( timespec='seconds' ),
+               'python': platform.python_version(),
+               'pandas': pd.__version__,
+               'numpy': np.__version__,
+               'machine': platform.machine(),
+               'seed': seed,
+               'results': [] }
+
+    for rows in sizes:
+        stages = run_size( rows, seed, track_memory )
+        report['results'].append( { 'rows': rows, 'stages': stages } )
+        print( '{:>12,} linhas: {:.2f} s no total'.format( rows, sum( s['seconds'] for s in stages.values() ) ) )
+
+    # pico de memória residente do processo inteiro (ru_maxrss é em KB no Linux)
+    report['max_rss_mb'] = round( resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss / 1024, 1 )
+
+    return report
+
+
+def compare( old, new, threshold=1.2 ):
+    """ Compara dois relatórios etapa a etapa
+
+        Input: relatórios (ver run), razão de tempo a partir da qual a etapa é uma regressão
+        Output: ( Dataframe com rows, stage, segundos antes/depois e ratio; houve regressão )
+    """
+    def flatten( report ):
+        return { ( result['rows'], stage ): values['seconds']
+                 for result in report['results'] for stage, values in result['stages'].items() }
+
+    before, after = flatten( old ), flatten( new )
+    keys = sorted( set( before ) & set( after ) )
+
+    df_aux = pd.DataFrame( [( rows, stage, before[( rows, stage )], after[( rows, stage )] ) for rows, stage in keys],
+                           columns=['rows', 'stage', 'before', 'after'] )
+    df_aux['ratio'] = df_aux['after'] / df_aux['before'].where( df_aux['before'] > 0 )
+
+    # etapas muito curtas oscilam demais para serem comparadas
+    regression = ( ( df_aux['ratio'] > threshold ) & ( df_aux['after'] > 0.01 ) ).any()
+
+    return df_aux, bool( regression )
+
+
+if __name__ == '__main__':
+    # python -m benchmarks.run [--rows 10000 100000] [--output arquivo.json]
+    # python -m benchmarks.run --compare antes.json depois.json [--threshold 1.2]
+    parser = argparse.ArgumentParser( description='Mede o tempo e a memória das etapas do dashboard em dados sintéticos' )
+    parser.add_argument( '--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='tamanhos do csv sintético' )
+    parser.add_argument( '--seed', type=int, default=0 )
+    parser.add_argument( '--no-memory', action='store_true', help='não mede o pico de memória (mais rápido)' )
+    parser.add_argument( '--output', help='arquivo JSON de saída (padrão: benchmarks/results/<commit>-<data>.json)' )
+    parser.add_argument( '--compare', nargs=2, metavar=( 'ANTES', 'DEPOIS' ), help='compara dois relatórios' )
+    parser.add_argument( '--threshold', type=float, default=1.2, help='razão de tempo considerada regressão' )
+    args = parser.parse_args()
+
+    if args.compare:
+        with open( args.compare[0] ) as old, open( args.compare[1] ) as new:
+            df_compare, regression = compare( json.load( old ), json.load( new ), args.threshold )
+
+        with pd.option_context( 'display.max_rows', None, 'display.width', 200 ):
+            print( df_compare.to_string( index=False ) )
+        sys.exit( 1 if regression else 0 )
+
+    report = run( args.rows, args.seed, not args.no_memory )
+
+    output = args.output
+    if output is None:
+        os.makedirs( RESULTS_DIR, exist_ok=True )
+        output = os.path.join( RESULTS_DIR, '{}-{}.json'.format( report['commit'] or 'local',
+                                                                datetime.now().strftime( '%Y%m%d-%H%M%S' ) ) )
+
+    with open( output, 'w' ) as file:
+        json.dump( report, file, indent=2 )
+    print( 'Resultados gravados em {}'.format( output ) )
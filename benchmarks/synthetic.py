@@ -0,0 +1,147 @@
+# libraries
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+
+# colunas na ordem do train.csv
+COLUMNS = ['ID', 'Delivery_person_ID', 'Delivery_person_Age', 'Delivery_person_Ratings',
+           'Restaurant_latitude', 'Restaurant_longitude', 'Delivery_location_latitude',
+           'Delivery_location_longitude', 'Order_Date', 'Time_Orderd', 'Time_Order_picked',
+           'Weatherconditions', 'Road_traffic_density', 'Vehicle_condition', 'Type_of_order',
+           'Type_of_vehicle', 'multiple_deliveries', 'Festival', 'City', 'Time_taken(min)']
+
+# valores com os mesmos espaços e prefixos do csv original
+WEATHER = ['conditions Sunny', 'conditions Stormy', 'conditions Cloudy', 'conditions Fog',
+           'conditions Windy', 'conditions Sandstorms']
+TRAFFIC = ['Low ', 'Medium ', 'High ', 'Jam ']
+ORDERS = ['Snack ', 'Meal ', 'Drinks ', 'Buffet ']
+VEHICLES = ['motorcycle ', 'scooter ', 'electric_scooter ', 'bicycle ']
+CITIES = ['Metropolitian ', 'Urban ', 'Semi-Urban ']
+
+# mesmo período do dataset original
+FIRST_DAY = '2022-02-11'
+LAST_DAY = '2022-04-06'
+
+# proporção de valores faltantes por coluna ('NaN ' como no csv)
+MISSING = { 'Delivery_person_Age': 0.04, 'Weatherconditions': 0.02, 'Road_traffic_density': 0.01,
+            'multiple_deliveries': 0.02, 'Festival': 0.005, 'City': 0.03 }
+
+# linhas geradas por vez (limita a memória ao gerar arquivos grandes)
+BLOCK_ROWS = 1_000_000
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def missing( values, rate, rng, token='NaN ' ):
+    """ Substitui uma fração rate dos valores pelo marcador de dado faltante """
+    values = values.astype( object )
+    values[rng.random( len( values ) ) < rate] = token
+
+    return values
+
+
+def generate_block( start, rows, couriers, restaurants, rng ):
+    """ Esta função gera um bloco de pedidos no formato bruto do train.csv
+
+        Input: número do primeiro pedido, quantidade de linhas, tabela de
+               entregadores e de restaurantes (ver generate), gerador aleatório
+        Output: Dataframe com as colunas de COLUMNS, ainda sujo (espaços,
+                'NaN ', 'conditions ...', '(min) ...')
+    """
+    courier = rng.integers( 0, len( couriers['id'] ), rows )
+    restaurant = rng.integers( 0, len( restaurants['lat'] ), rows )
+    days = pd.date_range( FIRST_DAY, LAST_DAY ).strftime( '%d-%m-%Y' ).values
+
+    rest_lat = restaurants['lat'][restaurant]
+    rest_lon = restaurants['lon'][restaurant]
+
+    age = missing( couriers['age'][courier].astype( str ), MISSING['Delivery_person_Age'], rng )
+    ratings = np.round( couriers['rating'][courier] + rng.normal( 0, 0.2, rows ), 1 ).clip( 1, 6 ).astype( str ).astype( object )
+    # no csv original a avaliação falta junto com a idade
+    ratings[age == 'NaN '] = 'NaN '
+
+    traffic = rng.choice( TRAFFIC, rows )
+    weather = np.where( rng.random( rows ) < MISSING['Weatherconditions'], 'conditions NaN', rng.choice( WEATHER, rows ) )
+
+    # tempo de entrega cresce com o trânsito
+    slowdown = pd.Series( traffic ).map( { 'Low ': 0, 'Medium ': 5, 'High ': 8, 'Jam ': 12 } ).values
+    minutes = ( rng.integers( 10, 40, rows ) + slowdown ).clip( 10, 54 )
+
+    df = pd.DataFrame( {
+        'ID': np.char.mod( '0x%04x ', np.arange( start, start + rows ) ),
+        'Delivery_person_ID': couriers['id'][courier],
+        'Delivery_person_Age': age,
+        'Delivery_person_Ratings': ratings,
+        'Restaurant_latitude': rest_lat,
+        'Restaurant_longitude': rest_lon,
+        'Delivery_location_latitude': rest_lat + rng.uniform( -0.1, 0.1, rows ),
+        'Delivery_location_longitude': rest_lon + rng.uniform( -0.1, 0.1, rows ),
+        'Order_Date': days[rng.integers( 0, len( days ), rows )],
+        'Time_Orderd': '11:30:00',
+        'Time_Order_picked': '11:45:00',
+        'Weatherconditions': weather,
+        'Road_traffic_density': missing( traffic, MISSING['Road_traffic_density'], rng ),
+        'Vehicle_condition': rng.integers( 0, 4, rows ),
+        'Type_of_order': rng.choice( ORDERS, rows ),
+        'Type_of_vehicle': rng.choice( VEHICLES, rows ),
+        'multiple_deliveries': missing( rng.integers( 0, 4, rows ).astype( str ), MISSING['multiple_deliveries'], rng ),
+        'Festival': missing( rng.choice( ['No ', 'Yes '], rows, p=[0.97, 0.03] ), MISSING['Festival'], rng ),
+        'City': missing( restaurants['city'][restaurant], MISSING['City'], rng ),
+        'Time_taken(min)': np.char.mod( '(min) %d', minutes ) } )
+
+    return df.loc[:, COLUMNS]
+
+
+def generate( rows, seed=0, block_rows=BLOCK_ROWS ):
+    """ Gera pedidos sintéticos compatíveis com o train.csv, bloco a bloco
+
+        A quantidade de entregadores e de restaurantes cresce com o volume
+        (cerca de 12 e 30 pedidos por cada, como no csv original), para que
+        contagens distintas e agrupamentos escalem de forma realista.
+
+        Input: total de linhas, semente, linhas por bloco
+        Output: gerador de Dataframes brutos (ver generate_block)
+    """
+    rng = np.random.default_rng( seed )
+
+    n_couriers = max( rows // 12, 10 )
+    number = np.arange( n_couriers )
+    # mesmo padrão dos ids originais (CITY..RES..DEL..), um id distinto por entregador
+    ids = np.char.add( np.char.add( np.char.mod( 'CITY%02dRES', number % 100 ),
+                                    np.char.mod( '%02dDEL', number // 100 % 100 ) ),
+                       np.char.mod( '%02d ', number // 10000 ) )
+    couriers = { 'id': ids.astype( object ),
+                 'age': rng.integers( 20, 40, n_couriers ),
+                 'rating': rng.uniform( 2.5, 5.0, n_couriers ) }
+
+    n_restaurants = max( rows // 30, 10 )
+    restaurants = { 'lat': rng.uniform( 10, 30, n_restaurants ),
+                    'lon': rng.uniform( 70, 88, n_restaurants ),
+                    'city': rng.choice( CITIES, n_restaurants ) }
+
+    for start in range( 0, rows, block_rows ):
+        yield generate_block( start, min( block_rows, rows - start ), couriers, restaurants, rng )
+
+
+def write_csv( path, rows, seed=0 ):
+    """ Grava um csv sintético com rows pedidos em path """
+    for i, block in enumerate( generate( rows, seed ) ):
+        block.to_csv( path, index=False, mode='w' if i == 0 else 'a', header=( i == 0 ) )
+
+    return path
+
+
+if __name__ == '__main__':
+    # python -m benchmarks.synthetic 1000000 dataset/sintetico.csv [--seed 0]
+    parser = argparse.ArgumentParser( description='Gera pedidos sintéticos no formato do train.csv' )
+    parser.add_argument( 'rows', type=int, help='quantidade de pedidos' )
+    parser.add_argument( 'output', help='csv de saída' )
+    parser.add_argument( '--seed', type=int, default=0 )
+    args = parser.parse_args()
+
+    write_csv( args.output, args.rows, args.seed )
+    print( '{}: {} pedidos'.format( args.output, args.rows ) )
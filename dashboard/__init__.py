@@ -0,0 +1 @@
+# Camada compartilhada entre as páginas do dashboard (carga, limpeza e agregações)
@@ -0,0 +1,55 @@
+# libraries
+
+import numpy as np
+
+from collections import namedtuple
+
+from dashboard.cube import moments, rollup
+
+
+# Métrica declarativa:
+# - name: nome do resultado
+# - op: 'mean', 'std' ou 'count' sobre uma medida do cubo
+# - measure: medida do cubo ('time', 'rating', 'distance')
+# - by / key: coluna de agrupamento e o grupo desejado (None para o total)
+Metric = namedtuple( 'Metric', ['name', 'op', 'measure', 'by', 'key'], defaults=[None, None] )
+
+CUBE_OPS = ( 'mean', 'std', 'count' )
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def compute_metrics( metrics, cells ):
+    """ Esta função calcula uma lista de métricas do cubo com uma única combinação por agrupamento
+
+        As métricas do cubo são agrupadas pela coluna 'by': para cada coluna
+        distinta as células são combinadas uma única vez (cube.rollup), com
+        todas as medidas necessárias juntas, e os totais (by=None) saem da
+        combinação desses grupos.
+
+        Input: lista de Metric, células do cubo já filtradas
+        Output: dicionário nome -> valor (NaN quando o grupo não existe no filtro)
+    """
+    results = {}
+
+    cube_metrics = [m for m in metrics if m.op in CUBE_OPS]
+    measures = sorted( { m.measure for m in cube_metrics } )
+
+    groupings = { m.by for m in cube_metrics if m.by is not None }
+    rollups = { by: rollup( cells, by, measures ).set_index( by ) for by in groupings }
+
+    if None in { m.by for m in cube_metrics }:
+        # total a partir de um agrupamento já feito, ou direto das células
+        source = next( iter( rollups.values() ) ) if rollups else cells
+        rollups[None] = rollup( source, None, measures )
+
+    stats = { ( by, measure ): moments( totals, measure ).set_index( totals.index )
+              for by, totals in rollups.items() for measure in measures }
+
+    for m in cube_metrics:
+        table = stats[( m.by, m.measure )]
+        key = table.index[0] if m.by is None else m.key
+        results[m.name] = table.at[key, m.op] if key in table.index else np.nan
+
+    return results
@@ -0,0 +1,94 @@
+# libraries
+
+import numpy as np
+import pandas as pd
+
+
+# granularidades oferecidas na barra lateral -> coluna com a chave inteira do período
+GRANULARITIES = { 'Dia': 'order_day', 'Semana': 'order_week', 'Mês': 'order_month' }
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def bucket_keys( dates ):
+    """ Chaves inteiras de dia, semana e mês calculadas sem formatar strings
+
+        - order_day: AAAAMMDD
+        - order_week: AAAA * 100 + semana do ano com domingo como primeiro dia
+          (o mesmo número de strftime("%U"))
+        - order_month: AAAAMM
+
+        Input: Series de datas
+        Output: Dataframe com as colunas order_day, order_week e order_month (int32)
+    """
+    dates = pd.DatetimeIndex( dates )
+    year = dates.year.values.astype( np.int32 )
+    month = dates.month.values.astype( np.int32 )
+
+    # domingo = 0, como em strftime("%w")
+    weekday = ( dates.dayofweek.values + 1 ) % 7
+    week = ( dates.dayofyear.values - 1 + 7 - weekday ) // 7
+
+    return pd.DataFrame( { 'order_day': year * 10000 + month * 100 + dates.day.values,
+                           'order_week': year * 100 + week,
+                           'order_month': year * 100 + month } ).astype( np.int32 )
+
+
+def add_time_keys( df1 ):
+    """ Grava as chaves de período (ver bucket_keys) no dataset limpo, uma única vez na carga """
+    keys = bucket_keys( df1['Order_Date'] )
+    for col in keys.columns:
+        df1[col] = keys[col].values
+
+    return df1
+
+
+def bucket_label( keys, granularity ):
+    """ Rótulo legível das chaves de período (só para os poucos períodos já agregados)
+
+        Input: Series de chaves inteiras, nome da granularidade ('Dia', 'Semana' ou 'Mês')
+        Output: Series de strings (AAAA-MM-DD, AAAA/semana ou AAAA-MM)
+    """
+    keys = pd.Series( keys )
+    if granularity == 'Dia':
+        return ( keys // 10000 ).astype( str ) + '-' + ( keys // 100 % 100 ).map( '{:02d}'.format ) + '-' + ( keys % 100 ).map( '{:02d}'.format )
+    if granularity == 'Semana':
+        return ( keys // 100 ).astype( str ) + '/' + ( keys % 100 ).map( '{:02d}'.format )
+
+    return ( keys // 100 ).astype( str ) + '-' + ( keys % 100 ).map( '{:02d}'.format )
+
+
+def orders_by_bucket( df1, granularity='Semana' ):
+    """ Pedidos, entregadores únicos e pedidos por entregador por período, num único agrupamento
+
+        Input: Dataframe filtrado (com as chaves de add_time_keys), granularidade
+        Output: Dataframe com 'bucket' (chave), 'label', 'orders', 'couriers' e 'order_by_delivery'
+    """
+    key = GRANULARITIES[granularity]
+    df_aux = ( df1.groupby( key )
+                  .agg( orders=( 'ID', 'count' ), couriers=( 'Delivery_person_ID', 'nunique' ) )
+                  .reset_index()
+                  .rename( columns={ key: 'bucket' } ) )
+
+    df_aux['order_by_delivery'] = df_aux['orders'] / df_aux['couriers']
+    df_aux.insert( 1, 'label', bucket_label( df_aux['bucket'], granularity ).values )
+
+    return df_aux
+
+
+def orders_by_bucket_cells( cells, granularity='Semana' ):
+    """ Pedidos por período a partir das células do cubo (sem entregadores únicos)
+
+        Input: células do cubo (ver cube.select_cells), granularidade
+        Output: Dataframe com 'bucket', 'label' e 'orders'
+    """
+    key = GRANULARITIES[granularity]
+    keys = bucket_keys( cells['Order_Date'] )[key].values
+
+    df_aux = ( cells['orders'].groupby( keys ).sum()
+                              .rename_axis( 'bucket' )
+                              .reset_index() )
+    df_aux.insert( 1, 'label', bucket_label( df_aux['bucket'], granularity ).values )
+
+    return df_aux
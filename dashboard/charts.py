@@ -0,0 +1,158 @@
+# libraries
+
+import os
+
+import numpy as np
+
+from datetime import date
+
+from dashboard.profiling import current_run
+
+
+# pontos por série enviados ao navegador; séries maiores são reduzidas (ver downsample)
+MAX_POINTS = int( os.environ.get( 'CURRY_MAX_POINTS', 400 ) )
+
+# casas decimais dos valores gravados nas figuras (ver compact)
+DECIMALS = 3
+
+# atributos dos traços com arrays de dados
+DATA_ATTRIBUTES = ( 'x', 'y', 'z', 'values', 'customdata' )
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def lttb( x, y, threshold ):
+    """ Esta função escolhe threshold pontos de uma série com o Largest-Triangle-Three-Buckets
+
+        O primeiro e o último ponto ficam; os demais são divididos em
+        threshold - 2 faixas consecutivas e, de cada faixa, fica o ponto que
+        forma o maior triângulo com o ponto escolhido na faixa anterior e a
+        média da faixa seguinte. Picos e vales sobrevivem à redução, o que
+        não acontece com médias por faixa.
+
+        Input: posições x e valores y (numéricos, em ordem de x), pontos desejados
+        Output: array com os índices dos pontos escolhidos, em ordem
+    """
+    n = len( y )
+    if threshold >= n or threshold < 3:
+        return np.arange( n )
+
+    x = np.asarray( x, dtype='float64' )
+    y = np.asarray( y, dtype='float64' )
+
+    # threshold - 2 faixas entre o primeiro e o último ponto
+    bounds = ( np.arange( threshold - 1 ) * ( n - 2 ) / ( threshold - 2 ) ).astype( int ) + 1
+    bounds[-1] = n - 1
+
+    selected = np.empty( threshold, dtype='int64' )
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range( threshold - 2 ):
+        start, stop = bounds[i], bounds[i + 1]
+        if i + 2 < len( bounds ):
+            avg_x, avg_y = x[stop:bounds[i + 2]].mean(), np.nanmean( y[stop:bounds[i + 2]] )
+        else:
+            avg_x, avg_y = x[n - 1], y[n - 1]
+
+        area = np.abs( ( x[a] - avg_x ) * ( y[start:stop] - y[a] ) - ( x[a] - x[start:stop] ) * ( avg_y - y[a] ) )
+        a = start + int( np.argmax( np.nan_to_num( area, nan=-1.0 ) ) )
+        selected[i + 1] = a
+
+    return selected
+
+
+def downsample( df, x, y, max_points=None, how='lttb' ):
+    """ Reduz uma série temporal a no máximo max_points pontos antes de desenhar
+
+        - how='lttb': mantém os pontos mais representativos (linhas, ver lttb)
+        - how='mean' / 'sum' / ...: agrega faixas de linhas consecutivas, com
+          o x do início de cada faixa (barras)
+
+        Input: Dataframe ordenado por x, colunas x e y, limite de pontos
+               (padrão: CURRY_MAX_POINTS), método
+        Output: Dataframe com as mesmas colunas (o próprio df se já couber)
+    """
+    max_points = max_points or MAX_POINTS
+    if len( df ) <= max_points:
+        return df
+
+    if how == 'lttb':
+        # posições das linhas como eixo: os rótulos de período nem sempre são numéricos
+        return df.iloc[lttb( np.arange( len( df ) ), df[y].to_numpy(), max_points )]
+
+    size = -( -len( df ) // max_points )
+    groups = np.arange( len( df ) ) // size
+
+    return df.groupby( groups ).agg( { x: 'first', y: how } ).reset_index( drop=True )
+
+
+def drill( df, x, start=None, end=None ):
+    """ Linhas de df com x no intervalo [start, end] (limites None ficam abertos), para ver um trecho em detalhe """
+    mask = np.ones( len( df ), dtype=bool )
+    if start is not None:
+        mask &= ( df[x] >= start ).to_numpy()
+    if end is not None:
+        mask &= ( df[x] <= end ).to_numpy()
+
+    return df[mask]
+
+
+def compact_array( values, decimals=DECIMALS ):
+    """ Versão compacta de um array para o JSON da figura
+
+        Números reais são arredondados e datas sem horário viram 'AAAA-MM-DD'
+        (em vez de 'AAAA-MM-DDT00:00:00'); outros valores não mudam.
+    """
+    if isinstance( values, ( str, bytes ) ) or not hasattr( values, '__len__' ):
+        return values
+
+    array = np.asarray( values )
+    if array.dtype.kind == 'f':
+        return np.round( array, decimals )
+
+    # o Plotly Express guarda as datas como objetos datetime
+    if array.dtype.kind == 'O' and len( array ) and all( isinstance( value, date ) for value in array ):
+        array = array.astype( 'datetime64[ns]' )
+
+    if array.dtype.kind == 'M' and ( array == array.astype( 'datetime64[D]' ) ).all():
+        return np.datetime_as_string( array, unit='D' )
+
+    return values
+
+
+def compact( fig, decimals=DECIMALS ):
+    """ Esta função reduz o JSON que o st.plotly_chart envia ao navegador
+
+        Arredonda os arrays numéricos dos traços (x, y, z, values, customdata
+        e tamanhos de marcador) e encurta as datas, sem mudar o desenho.
+
+        Input: figura do Plotly, casas decimais
+        Output: a mesma figura
+    """
+    for trace in fig.data:
+        for attr in DATA_ATTRIBUTES:
+            if attr in trace and trace[attr] is not None:
+                trace[attr] = compact_array( trace[attr], decimals )
+
+        if 'marker' in trace and 'size' in trace.marker and trace.marker.size is not None:
+            trace.marker.size = compact_array( trace.marker.size, decimals )
+
+    return fig
+
+
+def payload_size( fig ):
+    """ Tamanho (bytes) do JSON da figura, como enviado ao navegador """
+    return len( fig.to_json().encode( 'utf-8' ) )
+
+
+def payload_attrs( fig ):
+    """ Atributos de stage com o tamanho da figura ('payload', em bytes)
+
+        Serializar a figura custa quase o mesmo que enviá-la, então o tamanho
+        só é medido quando a reexecução está sendo medida (CURRY_PROFILE=1).
+
+        Uso: with stage( 'render:...', **payload_attrs( fig ) )
+    """
+    return { 'payload': payload_size( fig ) } if current_run() is not None else {}
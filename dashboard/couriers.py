@@ -0,0 +1,167 @@
+# libraries
+
+import numpy as np
+import pandas as pd
+
+from dashboard.cube import build_moments, moments, rollup
+from dashboard.data import ( DATASET_PATH, concat_frames, load_dataset, load_streamed, memo,
+                             register_stream, register_updater, streaming_enabled )
+from dashboard.parallel import aggregate
+
+
+# uma linha por entregador
+KEY = 'Delivery_person_ID'
+
+# medidas com momentos combináveis (ver cube.rollup)
+PROFILE_MEASURES = { 'rating': 'Delivery_person_Ratings',
+                     'time': 'Time_taken(min)' }
+
+# colunas com pedidos contados por valor: cidades atendidas e tipos de veículo
+PROFILE_COUNTS = { 'city': 'City',
+                   'vehicle': 'Type_of_vehicle' }
+
+PROFILE_COLUMNS = ( [KEY, 'Delivery_person_Age', 'Vehicle_condition'] + list( PROFILE_MEASURES.values() )
+                    + list( PROFILE_COUNTS.values() ) )
+
+# colunas da tabela da página, na ordem de exibição
+TABLE_COLUMNS = [KEY, 'orders', 'rating_mean', 'rating_std', 'time_mean', 'age',
+                 'vehicle', 'condition_min', 'condition_max', 'cities']
+
+# ordenações oferecidas na página: rótulo -> coluna da tabela
+SORT_OPTIONS = { 'Pedidos': 'orders',
+                 'Avaliação média': 'rating_mean',
+                 'Tempo médio': 'time_mean',
+                 'Idade': 'age',
+                 'Entregador': KEY }
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def count_columns( profiles, prefix ):
+    """ Colunas de contagem de um prefixo de PROFILE_COUNTS (ex.: 'city:Urban') """
+    return [col for col in profiles.columns if col.startswith( prefix + ':' )]
+
+
+def build_profiles( df1 ):
+    """ Esta função materializa o perfil de cada entregador
+
+        Guarda só valores combináveis: pedidos, momentos das avaliações e do
+        tempo de entrega, maior idade, menor e maior condição do veículo e
+        pedidos por cidade e por tipo de veículo. Assim o perfil de um lote
+        novo se junta ao do histórico sem reler as linhas (ver merge_profiles).
+
+        Input: Dataframe limpo
+        Output: Dataframe com uma linha por entregador
+    """
+    profiles = build_moments( df1, [KEY], PROFILE_MEASURES ).set_index( KEY )
+
+    grouped = df1.groupby( KEY, observed=True )
+    profiles['age'] = grouped['Delivery_person_Age'].max()
+    profiles['condition_min'] = grouped['Vehicle_condition'].min()
+    profiles['condition_max'] = grouped['Vehicle_condition'].max()
+
+    for prefix, col in PROFILE_COUNTS.items():
+        counts = df1.groupby( [KEY, col], observed=True ).size().unstack( fill_value=0 )
+        counts.columns = [prefix + ':' + str( value ) for value in counts.columns]
+        profiles = profiles.join( counts )
+
+    return profiles.reset_index()
+
+
+def merge_profiles( profiles ):
+    """ Junta perfis parciais (por exemplo, histórico + lote novo) entregador a entregador """
+    df_aux = concat_frames( profiles )
+
+    counts = [col for prefix in PROFILE_COUNTS for col in count_columns( df_aux, prefix )]
+    # um valor novo (cidade, veículo) só existe nos perfis do lote
+    df_aux[counts] = df_aux[counts].fillna( 0 ).astype( 'int64' )
+
+    grouped = df_aux.groupby( KEY, observed=True )
+    extras = grouped.agg( { 'age': 'max', 'condition_min': 'min', 'condition_max': 'max',
+                            **{ col: 'sum' for col in counts } } )
+
+    result = rollup( df_aux, KEY, list( PROFILE_MEASURES ) ).set_index( KEY ).join( extras )
+
+    return result.reset_index()
+
+
+def load_profiles( path=DATASET_PATH ):
+    """ Perfis dos entregadores, construídos uma única vez por versão do dataset
+
+        No modo streaming os perfis saem da mesma leitura do csv do cubo e dos
+        sketches (ver data.stream_aggregates). Lotes ingeridos atualizam os
+        perfis pelo updater registrado abaixo.
+    """
+    if streaming_enabled():
+        return load_streamed( 'couriers', path )
+
+    return memo( 'couriers', path,
+                 lambda: aggregate( build_profiles, merge_profiles, load_dataset( path ).loc[:, PROFILE_COLUMNS] ) )
+
+
+def labels( profiles, prefix ):
+    """ Valores com pedidos de cada entregador, separados por vírgula (ex.: 'Metropolitian, Urban')
+
+        Cada combinação distinta vira texto uma única vez: as linhas recebem
+        um número (bits dos valores presentes) que é traduzido por uma tabela.
+    """
+    cols = sorted( count_columns( profiles, prefix ) )
+    names = np.array( [col.split( ':', 1 )[1] for col in cols] )
+    present = profiles[cols].to_numpy() > 0
+
+    codes = present.astype( 'int64' ) @ ( 1 << np.arange( len( cols ), dtype='int64' ) )
+    unique, inverse = np.unique( codes, return_inverse=True )
+    text = np.array( [', '.join( names[( code >> np.arange( len( cols ) ) ) & 1 == 1] ) for code in unique], dtype=object )
+
+    return pd.Series( text[inverse], index=profiles.index )
+
+
+def profile_table( profiles ):
+    """ Tabela de exibição dos perfis: TABLE_COLUMNS, com desvio padrão, veículo mais usado e cidades """
+    df_aux = profiles.loc[:, [KEY, 'orders', 'age', 'condition_min', 'condition_max']]
+
+    ratings = moments( profiles, 'rating' )
+    df_aux['rating_mean'] = ratings['mean']
+    df_aux['rating_std'] = ratings['std']
+    df_aux['time_mean'] = moments( profiles, 'time' )['mean']
+
+    vehicles = count_columns( profiles, 'vehicle' )
+    names = np.array( [col.split( ':', 1 )[1] for col in vehicles], dtype=object )
+    df_aux['vehicle'] = names[profiles[vehicles].to_numpy().argmax( axis=1 )]
+    df_aux['cities'] = labels( profiles, 'city' )
+
+    return df_aux.loc[:, TABLE_COLUMNS]
+
+
+def load_profile_table( path=DATASET_PATH ):
+    """ Tabela de exibição dos perfis, uma única vez por versão do dataset (refeita dos perfis após um lote) """
+    return memo( 'courier_table', path, lambda: profile_table( load_profiles( path ) ) )
+
+
+def page_profiles( table, search='', sort_by='orders', ascending=False, page=1, page_size=50 ):
+    """ Esta função devolve uma página da tabela de perfis, já filtrada e ordenada
+
+        A busca e a ordenação rodam no servidor, sobre a tabela materializada:
+        só as linhas da página são enviadas ao navegador.
+
+        Input: tabela (ver profile_table), trecho do id do entregador (sem
+               diferenciar maiúsculas), coluna e sentido da ordenação,
+               número da página (a partir de 1; além da última vira a última),
+               linhas por página
+        Output: ( Dataframe com as linhas da página, total de entregadores encontrados )
+    """
+    if search:
+        # em uma coluna categórica, .str compara cada id distinto uma única vez
+        table = table[table[KEY].str.contains( search, case=False, regex=False ).to_numpy()]
+
+    total = len( table )
+    pages = max( -( -total // page_size ), 1 )
+    start = ( min( max( page, 1 ), pages ) - 1 ) * page_size
+    rows = table.sort_values( sort_by, ascending=ascending, kind='mergesort', na_position='last' )
+
+    return rows.iloc[start:start + page_size].reset_index( drop=True ), total
+
+
+register_updater( 'couriers', lambda profiles, delta: merge_profiles( [profiles, build_profiles( delta )] ) )
+register_stream( 'couriers', build_profiles, merge_profiles )
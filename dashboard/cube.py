@@ -0,0 +1,186 @@
+# libraries
+
+import numpy as np
+import pandas as pd
+
+from dashboard.data import ( DATASET_PATH, concat_frames, load_dataset, load_streamed, memo,
+                             register_stream, register_updater, streaming_enabled )
+from dashboard.parallel import aggregate
+
+
+# dimensões do cubo: tudo que os filtros e os gráficos das páginas usam como chave
+DIMENSIONS = ['Order_Date', 'Road_traffic_density', 'City', 'Festival', 'Type_of_order', 'Weatherconditions']
+
+# medidas por célula: contagem, média e M2 (momentos combináveis, ver rollup)
+MEASURES = { 'time': 'Time_taken(min)',
+             'rating': 'Delivery_person_Ratings',
+             'distance': 'distance' }
+
+# colunas lidas pelo cubo: só elas vão para os processos de aggregate
+CUBE_COLUMNS = DIMENSIONS + list( MEASURES.values() )
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def build_moments( df1, keys, measures=MEASURES ):
+    """ Quantidade de pedidos e momentos parciais das medidas por grupo
+
+        Para cada medida: contagem de valores válidos, média e M2 (soma dos
+        quadrados dos desvios em relação à média), combináveis por rollup.
+
+        Input: Dataframe limpo, colunas de agrupamento, medidas { nome: coluna }
+        Output: Dataframe com as chaves, 'orders' e <medida>_n, <medida>_mean, <medida>_m2
+    """
+    parts = { 'orders': pd.Series( 1, index=df1.index, dtype='int64' ) }
+    for name, col in measures.items():
+        parts[name] = df1[col].astype( 'float64' )
+
+    aux = pd.concat( [df1.loc[:, keys], pd.DataFrame( parts )], axis=1 )
+    grouped = aux.groupby( keys, observed=True )
+
+    result = grouped['orders'].sum().to_frame()
+    for name in measures:
+        # a variância do pandas já é calculada de forma estável; M2 = var * ( n - 1 )
+        stats = grouped[name].agg( ['count', 'mean', 'var'] )
+        result[name + '_n'] = stats['count'].astype( 'int64' )
+        result[name + '_mean'] = stats['mean']
+        result[name + '_m2'] = ( stats['var'] * ( stats['count'] - 1 ) ).fillna( 0 )
+
+    return result.reset_index()
+
+
+def build_cube( df1 ):
+    """ Esta função agrega o dataset limpo em células DIMENSIONS x momentos parciais
+
+        Cada célula guarda a quantidade de pedidos e, para cada medida em
+        MEASURES, a contagem de valores válidos, a média e M2 (ver
+        build_moments). Esses momentos se juntam sem perda de precisão (ver
+        rollup), então qualquer recorte dos filtros é respondido combinando
+        células (ver select_cells e summarize).
+
+        Input: Dataframe limpo
+        Output: Dataframe com uma linha por combinação observada das dimensões
+    """
+    return build_moments( df1, DIMENSIONS )
+
+
+def rollup( cells, by, measures=tuple( MEASURES ) ):
+    """ Combina os momentos das células por grupo (fórmula de Chan)
+
+        Para cada grupo: n = soma de n_i, média = soma de n_i * média_i / n e
+        M2 = soma de M2_i + soma de n_i * ( média_i - média )^2. Os desvios
+        são medidos em relação à média do próprio grupo, então o resultado
+        é exato e estável mesmo com muitas células ou valores grandes.
+
+        Input: células do cubo, coluna(s) de agrupamento ou None para o total,
+               medidas a combinar
+        Output: Dataframe com as colunas de agrupamento, 'orders' e, para cada
+                medida, <medida>_n, <medida>_mean e <medida>_m2
+    """
+    keys = ['_all'] if by is None else ( [by] if isinstance( by, str ) else list( by ) )
+
+    aux = cells.loc[:, [] if by is None else keys].copy()
+    if by is None:
+        aux['_all'] = 0
+    aux['orders'] = cells['orders']
+
+    for name in measures:
+        n = cells[name + '_n'].astype( 'float64' )
+        aux[name + '_n'] = n
+        aux[name + '_nm'] = n * cells[name + '_mean'].fillna( 0 )
+
+    sums = [name + suffix for name in measures for suffix in ( '_n', '_nm' )]
+    totals = aux.groupby( keys, observed=True )[sums].transform( 'sum' )
+
+    for name in measures:
+        group_mean = totals[name + '_nm'] / totals[name + '_n'].where( totals[name + '_n'] > 0 )
+        deviation = aux[name + '_n'] * ( cells[name + '_mean'] - group_mean ) ** 2
+        aux[name + '_m2'] = cells[name + '_m2'] + deviation.fillna( 0 )
+
+    result = aux.groupby( keys, observed=True ).sum()
+    if by is None:
+        # o total sempre tem uma linha, mesmo sem células no filtro
+        result = result.reindex( [0], fill_value=0 )
+
+    for name in measures:
+        n = result[name + '_n']
+        result[name + '_mean'] = result[name + '_nm'] / n.where( n > 0 )
+        result[name + '_n'] = n.astype( 'int64' )
+
+    result = result.loc[:, ['orders'] + [name + suffix for name in measures for suffix in ( '_n', '_mean', '_m2' )]]
+
+    return result.reset_index( drop=True ) if by is None else result.reset_index()
+
+
+def merge_cubes( cubes ):
+    """ Junta cubos parciais (por exemplo, histórico + lote novo) combinando as células iguais """
+    return rollup( concat_frames( cubes ), DIMENSIONS )
+
+
+def load_cube( path=DATASET_PATH ):
+    """ Cubo do dataset, construído uma única vez por versão do csv
+
+        No modo streaming (ver data.streaming_enabled) o cubo é montado
+        bloco a bloco, na mesma leitura do csv dos demais agregados (ver
+        data.stream_aggregates), e o dataset completo nunca é carregado. Com
+        CURRY_WORKERS, as partições de datas são agregadas em paralelo.
+    """
+    if streaming_enabled():
+        return load_streamed( 'cube', path )
+
+    return memo( 'cube', path, lambda: aggregate( build_cube, merge_cubes, load_dataset( path ).loc[:, CUBE_COLUMNS] ) )
+
+
+def select_cells( cube, date_limit, traffic_options ):
+    """ Aplica os filtros da barra lateral sobre as células do cubo
+
+        Input: cubo, data limite (exclusiva), lista de condições de trânsito
+        Output: Dataframe com as células selecionadas
+    """
+    linhas_selecionadas = ( ( cube['Order_Date'] < date_limit )
+                          & ( cube['Road_traffic_density'].isin( traffic_options ) ) )
+
+    return cube.loc[linhas_selecionadas, :]
+
+
+def orders_by( cells, by ):
+    """ Quantidade de pedidos por grupo
+
+        Input: células do cubo, coluna(s) de agrupamento
+        Output: Dataframe com as colunas de agrupamento e 'orders'
+    """
+    return cells.groupby( by, observed=True )['orders'].sum().reset_index()
+
+
+def moments( totals, measure ):
+    """ Contagem, média e desvio padrão (amostral, como no pandas) a partir dos momentos de uma medida
+
+        Input: Dataframe com as colunas <measure>_n, <measure>_mean e <measure>_m2
+        Output: Dataframe com 'count', 'mean' e 'std', alinhado com totals
+    """
+    n = totals[measure + '_n'].astype( 'float64' )
+    var = totals[measure + '_m2'] / ( n - 1 ).where( n > 1 )
+
+    return pd.DataFrame( { 'count': n.astype( 'int64' ),
+                           'mean': totals[measure + '_mean'].where( n > 0 ),
+                           'std': np.sqrt( var.clip( lower=0 ) ) } )
+
+
+def summarize( cells, by, measure ):
+    """ Média e desvio padrão de uma medida por grupo
+
+        Input: células do cubo, coluna(s) de agrupamento ou None para o total,
+               nome da medida em MEASURES ('time', 'rating' ou 'distance')
+        Output: Dataframe com as colunas de agrupamento, 'count', 'mean' e 'std'
+    """
+    totals = rollup( cells, by, [measure] )
+    cols = ['orders', measure + '_n', measure + '_mean', measure + '_m2']
+
+    result = pd.concat( [totals.drop( columns=cols ), moments( totals, measure )], axis=1 )
+
+    return result
+
+
+register_updater( 'cube', lambda cube, delta: merge_cubes( [cube, build_cube( delta )] ) )
+register_stream( 'cube', build_cube, merge_cubes )
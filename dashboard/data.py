@@ -0,0 +1,682 @@
+# libraries
+
+import os
+import hashlib
+import threading
+
+import pandas as pd
+
+from pandas.api.extensions import take
+from pandas.api.types import union_categoricals
+
+from dashboard.buckets import add_time_keys
+from dashboard.geo import add_distance
+from dashboard.profiling import stage
+
+
+DATASET_PATH = 'dataset/train.csv'
+
+# cache em disco do dataset limpo (parquet, numa pasta ao lado do csv);
+# mude CACHE_VERSION sempre que a limpeza ou o schema mudarem
+CACHE_DIR = '.cache'
+CACHE_VERSION = 4
+
+# teto de memória (MB) para o modo streaming: com ele definido, o csv é lido em
+# blocos e as páginas usam só os agregados, sem carregar o dataset inteiro
+MAX_MEMORY_MB = os.environ.get( 'CURRY_MAX_MEMORY_MB' )
+
+# quantas vezes o bloco bruto cresce durante a limpeza (cópias intermediárias)
+CHUNK_OVERHEAD = 4
+
+# lotes de pedidos ingeridos depois do csv (já limpos, em parquet, ver dashboard.ingest)
+BATCH_DIR = '.batches'
+
+# com tantos lotes na pasta, a ingestão junta os lotes (ver compact_batches)
+COMPACT_BATCHES = int( os.environ.get( 'CURRY_COMPACT_BATCHES', 20 ) )
+
+# cache do processo: (nome, caminho) -> (versão do dataset, valor)
+_CACHE = {}
+
+# _LOCK só protege os dicionários (consultas rápidas); cada construção usa o lock da
+# sua chave, então um valor pronto nunca espera a construção de outro
+_LOCK = threading.RLock()
+_KEY_LOCKS = {}
+
+# construções de memo em andamento em cada thread, da mais externa para a mais
+# interna: versões do dataset que cada uma leu (ver consume)
+_BUILDS = threading.local()
+
+# tentativas de construir um valor quando um lote some no meio da leitura (ver memo)
+BUILD_ATTEMPTS = 3
+
+# funções que atualizam um valor do cache com um lote novo: nome -> updater( valor, delta )
+_UPDATERS = {}
+
+# agregados do modo streaming, montados na mesma leitura do csv: nome -> ( build, merge, size )
+_STREAMS = {}
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def fingerprint( path ):
+    """ Identifica a versão do arquivo de origem pelo caminho, tamanho e data de modificação """
+    stat = os.stat( path )
+    return ( os.path.abspath( path ), stat.st_size, stat.st_mtime_ns )
+
+
+def dataset_folder( path, kind ):
+    """ Pasta de cache (CACHE_DIR) ou de lotes (BATCH_DIR) do csv
+
+        Cada csv tem a sua subpasta, com o nome completo do arquivo: datasets
+        vizinhos (ex.: train.csv e train-2024.csv) nunca misturam lotes ou caches.
+    """
+    return os.path.join( os.path.dirname( path ), kind, os.path.basename( path ) )
+
+
+def batch_paths( path ):
+    """ Lotes ingeridos para o csv, na ordem em que foram gravados """
+    folder = dataset_folder( path, BATCH_DIR )
+    if not os.path.isdir( folder ):
+        return []
+
+    names = sorted( name for name in os.listdir( folder ) if name.endswith( '.parquet' ) )
+
+    return [os.path.join( folder, name ) for name in names]
+
+
+def dataset_version( path ):
+    """ Versão do dataset completo: o csv de origem mais os lotes ingeridos """
+    return ( fingerprint( path ), ) + tuple( fingerprint( batch ) for batch in batch_paths( path ) )
+
+
+def new_batches( old_version, version ):
+    """ Lotes que levam old_version a version (impressões digitais, ver fingerprint)
+
+        Output: tupla com os lotes gravados depois de old_version, ou None se
+                version não for old_version mais lotes novos (csv regravado,
+                lotes removidos ou juntados)
+    """
+    if old_version is None or len( version ) <= len( old_version ) or version[:len( old_version )] != old_version:
+        return None
+
+    return version[len( old_version ):]
+
+
+def open_batch( batch ):
+    """ Abre um lote conferindo que o arquivo ainda é o da impressão digital (ver fingerprint)
+
+        Output: arquivo aberto em modo binário; FileNotFoundError se o lote foi
+                removido ou trocado (ex.: compactação) depois da leitura da versão
+    """
+    file = open( batch[0], 'rb' )
+    stat = os.fstat( file.fileno() )
+    if ( stat.st_size, stat.st_mtime_ns ) != tuple( batch[1:] ):
+        file.close()
+        raise FileNotFoundError( batch[0] )
+
+    return file
+
+
+def read_batch( batch ):
+    """ Lê um lote exatamente na versão da impressão digital, sem guardar cópia em memória """
+    with open_batch( batch ) as file:
+        return pd.read_parquet( file )
+
+
+def read_delta( batches ):
+    """ Lotes novos (ver new_batches) empilhados num único delta limpo """
+    return concat_frames( [read_batch( batch ) for batch in batches] )
+
+
+def consume( version ):
+    """ Anota a versão do dataset que a construção em andamento nesta thread leu (ver memo)
+
+        Quem lê o csv e os lotes (build_dataset, read_chunks) ou recebe um
+        valor de memo chama esta função, e memo guarda o valor construído com
+        a versão que foi de fato lida, não com uma lida antes de builder().
+    """
+    builds = getattr( _BUILDS, 'stack', None )
+    if builds:
+        builds[-1].add( version )
+
+
+def build( name, builder, version ):
+    """ Executa builder() e devolve ( valor, versão do dataset que ele leu )
+
+        Se builder() leu versões diferentes (ex.: um lote chegou entre duas
+        leituras), a versão fica None e o valor é reconstruído no próximo
+        pedido. Um lote que some no meio da leitura (ver open_batch) faz a
+        construção recomeçar com a versão nova, até BUILD_ATTEMPTS vezes.
+
+        Input: nome do valor, função sem argumentos, versão lida antes da construção
+        Output: ( valor, versão )
+    """
+    builds = _BUILDS.__dict__.setdefault( 'stack', [] )
+
+    for attempt in range( BUILD_ATTEMPTS ):
+        builds.append( set() )
+        try:
+            with stage( 'build:' + name ):
+                value = builder()
+        except FileNotFoundError:
+            if attempt == BUILD_ATTEMPTS - 1:
+                raise
+            continue
+        finally:
+            consumed = builds.pop()
+
+        if not consumed:
+            return value, version
+        return value, consumed.pop() if len( consumed ) == 1 else None
+
+
+def memo( name, path, builder ):
+    """ Esta função guarda o resultado de builder() uma única vez por processo
+
+        O valor fica associado à versão do dataset que builder() leu (ver
+        dataset_version e consume):
+        enquanto o csv e os lotes não mudarem, todas as sessões recebem o
+        mesmo objeto. Quando só chegam lotes novos (gravados por qualquer
+        processo, ver dashboard.ingest) e há um updater para o valor, só os
+        lotes novos são lidos e aplicados ao valor antigo (ver register_updater);
+        nos demais casos o valor é reconstruído.
+
+        Sessões que pedem o mesmo valor durante a construção esperam por ela
+        (builder() roda uma única vez); as que pedem outros valores não.
+
+        Input: nome do valor, caminho do dataset, função sem argumentos
+        Output: valor construído por builder()
+    """
+    key = ( name, os.path.abspath( path ) )
+    version = dataset_version( path )
+
+    with _LOCK:
+        entry = _CACHE.get( key )
+        if entry is not None and entry[0] == version:
+            consume( version )
+            return entry[1]
+        key_lock = _KEY_LOCKS.setdefault( key, threading.RLock() )
+
+    with key_lock:
+        # outra thread pode ter construído o valor enquanto esta esperava
+        with _LOCK:
+            entry = _CACHE.get( key )
+        if entry is not None and entry[0] == version:
+            consume( version )
+            return entry[1]
+
+        batches = new_batches( entry[0], version ) if entry is not None and name in _UPDATERS else None
+        try:
+            if batches:
+                with stage( 'update:' + name, batches=len( batches ) ):
+                    value = _UPDATERS[name]( entry[1], read_delta( batches ) )
+        except OSError:
+            # lote removido entre a leitura da versão e a do arquivo (ex.: compactação)
+            batches = None
+
+        if not batches:
+            value, version = build( name, builder, version )
+
+        with _LOCK:
+            _CACHE[key] = ( version, value )
+
+    # um valor montado sobre este (ex.: o cubo sobre o dataset) fica com a mesma versão
+    consume( version )
+    return value
+
+
+def register_updater( name, updater ):
+    """ Registra como atualizar o valor 'name' do cache quando chegam lotes novos (ver memo)
+
+        updater( valor_antigo, delta ) recebe os lotes novos já limpos (ver
+        prepare) e devolve o valor atualizado, sem recalcular o histórico inteiro.
+    """
+    _UPDATERS[name] = updater
+
+
+def forget( path ):
+    """ Descarta todos os valores guardados por memo para o dataset em path (libera a memória) """
+    source = os.path.abspath( path )
+
+    with _LOCK:
+        for key in [key for key in _CACHE if key[1] == source]:
+            del _CACHE[key]
+
+
+# schema compacto do dataset limpo: textos de baixa cardinalidade viram categorias
+# e números são reduzidos ao menor tipo que comporta os valores
+CATEGORY_COLUMNS = ['Delivery_person_ID', 'Weatherconditions', 'Road_traffic_density',
+                    'Type_of_order', 'Type_of_vehicle', 'Festival', 'City']
+INTEGER_COLUMNS = ['Delivery_person_Age', 'Vehicle_condition', 'multiple_deliveries', 'Time_taken(min)']
+FLOAT_COLUMNS = ['Delivery_person_Ratings', 'Restaurant_latitude', 'Restaurant_longitude',
+                 'Delivery_location_latitude', 'Delivery_location_longitude', 'distance']
+
+# colunas de texto que chegam com espaços sobrando no csv
+TEXT_COLUMNS = ['ID', 'Delivery_person_ID', 'Road_traffic_density', 'Type_of_order',
+                'Type_of_vehicle', 'Festival', 'City']
+
+
+def map_unique( series, func ):
+    """ Aplica func aos valores distintos da coluna e replica o resultado para as linhas
+
+        As colunas do dataset têm poucos valores distintos, então converter
+        cada valor uma única vez evita o loop em Python linha a linha.
+
+        Input: Series, função que recebe e devolve um Index com os valores distintos
+        Output: Series com o mesmo índice da entrada
+    """
+    codes, uniques = pd.factorize( series )
+    values = take( func( pd.Index( uniques ) ).values, codes, allow_fill=True )
+    return pd.Series( values, index=series.index, name=series.name )
+
+
+def clean_code( df1 ):
+    """ Está funcao tem a responsabilidade de limpar o dataframe 
+        
+        Tipos de limpeza: 
+        1. Remoção dos dados NaN
+        2. Mudança do tipo da coluna de dados
+        3. Remoção dos espaços das variáveis de texto
+        4. Formatação da coluna de datas
+        5. Limpeza da coluna de tempo (remoção do texto da variável numérica)
+
+        Todas as linhas inválidas são marcadas numa única máscara, o
+        dataframe é copiado uma única vez e as conversões são feitas sobre
+        os valores distintos de cada coluna (ver map_unique).
+        
+        Input: Dataframe
+        Output: Dataframe
+    """
+
+    # 1. removendo espaços das colunas de texto (antes do filtro, para testar 'NaN')
+    stripped = { col: map_unique( df1[col], lambda x: x.str.strip() ) for col in TEXT_COLUMNS }
+
+    # 2. máscara única com todas as regras de dados faltantes
+    linhas_selecionadas = ( ( df1['Delivery_person_Age'] != 'NaN ' )
+                          & ( df1['multiple_deliveries'] != 'NaN ' )
+                          & ( df1['Delivery_person_Ratings'] != 'NaN' )
+                          & ( df1['Weatherconditions'] != 'NaN' )
+                          & ( stripped['Road_traffic_density'] != 'NaN' )
+                          & ( stripped['City'] != 'NaN' )
+                          & ( stripped['Festival'] != 'NaN' ) )
+
+    # 3. materializando o resultado uma única vez
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+    for col in TEXT_COLUMNS:
+        df1[col] = stripped[col][linhas_selecionadas]
+
+    # 4. convertendo as colunas numéricas e de data
+    df1['Delivery_person_Age'] = map_unique( df1['Delivery_person_Age'], lambda x: x.astype(int) )
+    df1['Delivery_person_Ratings'] = map_unique( df1['Delivery_person_Ratings'], lambda x: x.astype(float) )
+    df1['multiple_deliveries'] = map_unique( df1['multiple_deliveries'], lambda x: x.astype(int) )
+    df1['Order_Date'] = map_unique( df1['Order_Date'], lambda x: pd.to_datetime( x, format='%d-%m-%Y' ) )
+
+    # 5. limpando a coluna de time taken ('(min) 24' -> 24)
+    df1['Time_taken(min)'] = map_unique( df1['Time_taken(min)'],
+                                         lambda x: x.str.split( '(min) ', n=1, regex=False ).str[1].astype(int) )
+    
+    return df1
+
+
+def apply_schema( df1 ):
+    """ Converte o dataset limpo para o schema compacto (CATEGORY_COLUMNS, INTEGER_COLUMNS, FLOAT_COLUMNS)
+
+        Delivery_person_ID vira uma categoria ordenada (ordem alfabética),
+        para que max/min continuem funcionando como nas strings originais.
+        Agrupamentos por colunas categóricas devem usar observed=True.
+
+        Input: Dataframe limpo
+        Output: o mesmo Dataframe, com os tipos reduzidos
+    """
+    for col in CATEGORY_COLUMNS:
+        df1[col] = df1[col].astype( pd.CategoricalDtype( ordered=( col == 'Delivery_person_ID' ) ) )
+
+    for col in INTEGER_COLUMNS:
+        df1[col] = pd.to_numeric( df1[col], downcast='integer' )
+
+    for col in FLOAT_COLUMNS:
+        if col in df1.columns:
+            df1[col] = pd.to_numeric( df1[col], downcast='float' )
+
+    return df1
+
+
+def memory_report( before, after ):
+    """ Compara os bytes ocupados por coluna antes e depois de apply_schema
+
+        Input: Dataframe original, Dataframe com o schema compacto
+        Output: Dataframe com dtype e bytes por coluna, mais uma linha 'total'
+    """
+    report = pd.DataFrame( { 'dtype_before': before.dtypes.astype( str ),
+                             'bytes_before': before.memory_usage( index=False, deep=True ),
+                             'dtype_after': after.dtypes.astype( str ),
+                             'bytes_after': after.memory_usage( index=False, deep=True ) } )
+
+    report.loc['total', ['bytes_before', 'bytes_after']] = report[['bytes_before', 'bytes_after']].sum()
+    report['reduction'] = 1 - report['bytes_after'] / report['bytes_before']
+
+    return report
+
+
+def concat_frames( frames ):
+    """ Empilha dataframes com o schema compacto, unindo as categorias de cada coluna
+
+        Input: lista de Dataframes com as mesmas colunas
+        Output: Dataframe empilhado, com categorias em ordem alfabética (como em apply_schema)
+    """
+    df1 = pd.concat( frames )
+    for col in CATEGORY_COLUMNS:
+        if col in df1.columns:
+            values = union_categoricals( [frame[col] for frame in frames], ignore_order=True )
+            values = values.reorder_categories( sorted( values.categories ), ordered=( col == 'Delivery_person_ID' ) )
+            df1[col] = values
+
+    return df1
+
+
+def sort_by_date( df1 ):
+    """ Ordena o dataset por Order_Date (ordenação estável), base do filtro por busca binária """
+    if df1['Order_Date'].is_monotonic_increasing:
+        return df1
+
+    return df1.sort_values( 'Order_Date', kind='mergesort' )
+
+
+def prepare( df ):
+    """ Limpa o csv bruto, calcula as distâncias e as chaves de período e aplica o schema compacto """
+    with stage( 'clean_code' ):
+        df1 = clean_code( df )
+    with stage( 'distance' ):
+        df1 = add_distance( df1 )
+    with stage( 'time_keys' ):
+        df1 = add_time_keys( df1 )
+    with stage( 'schema' ):
+        return apply_schema( df1 )
+
+
+def batch_name( batch ):
+    """ Nome de um lote sem a extensão; a ordem alfabética dos nomes é a ordem de ingestão """
+    return os.path.splitext( os.path.basename( batch ) )[0]
+
+
+def cache_path( path, through=None ):
+    """ Caminho do parquet do dataset limpo para a versão atual do csv de origem
+
+        Um cache que também inclui os lotes ingeridos até o lote through
+        (ver compact_batches) leva o nome desse lote depois de um '+'.
+    """
+    key = repr( ( fingerprint( path ), CACHE_VERSION ) ).encode()
+    digest = hashlib.sha1( key ).hexdigest()[:16]
+    name = digest if through is None else '{}+{}'.format( digest, through )
+
+    return os.path.join( dataset_folder( path, CACHE_DIR ), name + '.parquet' )
+
+
+def find_cache( path ):
+    """ Cache em disco da versão atual do csv: ( caminho, último lote incluído ou None ), ou None """
+    cached = cache_path( path )
+    folder = os.path.dirname( cached )
+    prefix = os.path.splitext( os.path.basename( cached ) )[0] + '+'
+    if not os.path.isdir( folder ):
+        return None
+
+    compacted = sorted( name for name in os.listdir( folder ) if name.startswith( prefix ) and name.endswith( '.parquet' ) )
+    if compacted:
+        return os.path.join( folder, compacted[-1] ), os.path.splitext( compacted[-1] )[0][len( prefix ):]
+
+    return ( cached, None ) if os.path.exists( cached ) else None
+
+
+def read_cache( path ):
+    """ Lê o dataset limpo do cache em disco
+
+        Output: ( Dataframe, último lote incluído ou None ), ou ( None, None )
+                se o cache não existir ou estiver desatualizado
+    """
+    found = find_cache( path )
+    if found is None:
+        return None, None
+
+    try:
+        return pd.read_parquet( found[0], memory_map=True ), found[1]
+    except ( ImportError, OSError ):
+        # pyarrow não instalado ou cache trocado por uma compactação: segue sem cache em disco
+        return None, None
+
+
+def write_cache( path, df1, through=None ):
+    """ Grava o dataset limpo em parquet e remove os caches de versões anteriores do csv
+
+        Input: caminho do csv, dataset limpo, último lote incluído em df1 (None: só o csv)
+    """
+    cached = cache_path( path, through )
+    folder = os.path.dirname( cached )
+
+    try:
+        os.makedirs( folder, exist_ok=True )
+        # grava num arquivo temporário para que outro processo nunca leia um parquet pela metade
+        tmp = '{}.{}.tmp'.format( cached, os.getpid() )
+        df1.to_parquet( tmp )
+        os.replace( tmp, cached )
+    except ( ImportError, OSError ):
+        return
+
+    for name in os.listdir( folder ):
+        old = os.path.join( folder, name )
+        if name.endswith( '.parquet' ) and old != cached:
+            os.remove( old )
+
+
+def build_dataset( path, version=None ):
+    """ Lê o csv, limpa e calcula as distâncias, reaproveitando o cache em disco quando possível
+
+        Os lotes ingeridos depois do csv já estão limpos e são apenas
+        empilhados; os que já estão no cache (ver compact_batches) são
+        pulados. O resultado fica ordenado por Order_Date (ver dashboard.index).
+
+        Input: caminho do csv, versão do dataset a ler (padrão: a atual, ver dataset_version)
+        Output: Dataframe limpo com exatamente os lotes da versão
+    """
+    version = dataset_version( path ) if version is None else version
+    with stage( 'read_cache' ):
+        df1, through = read_cache( path )
+
+    if df1 is None:
+        with stage( 'read_csv' ):
+            df_raw = pd.read_csv( path )
+        df1 = prepare( df_raw )
+        with stage( 'sort_by_date' ):
+            df1 = sort_by_date( df1 )
+        with stage( 'write_cache' ):
+            write_cache( path, df1 )
+
+    if through is not None and ( len( version ) < 2 or batch_name( version[-1][0] ) < through ):
+        # cache compactado com lotes mais novos que a versão pedida: quem pediu lê a versão nova
+        raise FileNotFoundError( cache_path( path, through ) )
+
+    batches = [batch for batch in version[1:] if through is None or batch_name( batch[0] ) > through]
+    if batches:
+        with stage( 'batches', count=len( batches ) ):
+            df1 = sort_by_date( concat_frames( [df1] + [read_batch( batch ) for batch in batches] ) )
+
+    consume( version )
+    return df1
+
+
+def compact_batches( path=DATASET_PATH ):
+    """ Esta função junta os lotes ingeridos, para a pasta de lotes não crescer sem limite
+
+        - fora do modo streaming, grava o dataset completo (csv + lotes) no
+          cache em disco, anotado com o último lote: ao iniciar, os processos
+          leem só o cache e pulam esses lotes (ver build_dataset)
+        - junta os lotes num único parquet com o nome do último, que é o que
+          o modo streaming lê depois do csv (ver read_chunks)
+
+        Os processos em execução percebem a nova versão e reconstroem seus
+        valores uma vez, a partir do cache.
+
+        Input: caminho do csv
+        Output: quantidade de lotes juntados
+    """
+    # exatamente os lotes desta versão: um lote gravado durante a compactação fica para a próxima
+    version = dataset_version( path )
+    batches = [batch[0] for batch in version[1:]]
+    if len( batches ) < 2:
+        return 0
+
+    if not streaming_enabled():
+        with stage( 'compact:cache' ):
+            write_cache( path, build_dataset( path, version ), through=batch_name( batches[-1] ) )
+
+    with stage( 'compact:batches', count=len( batches ) ):
+        merged = concat_frames( [read_batch( batch ) for batch in version[1:]] )
+        tmp = '{}.{}.tmp'.format( batches[-1], os.getpid() )
+        merged.to_parquet( tmp, row_group_size=chunk_rows( path, MAX_MEMORY_MB or 512 ) )
+
+        # sem os lotes antigos antes da troca: quem ler no meio vê uma versão
+        # que ainda vai mudar (ver dataset_version) e reconstrói de novo
+        for batch in batches[:-1]:
+            os.remove( batch )
+        os.replace( tmp, batches[-1] )
+
+    return len( batches )
+
+
+def streaming_enabled():
+    """ True quando o dashboard roda no modo streaming (CURRY_MAX_MEMORY_MB definido) """
+    return MAX_MEMORY_MB is not None
+
+
+def chunk_rows( path, max_memory_mb, sample=1000 ):
+    """ Quantas linhas do csv cabem num bloco dentro do teto de memória
+
+        Mede a memória ocupada por uma amostra das primeiras linhas e
+        reserva CHUNK_OVERHEAD vezes esse espaço para a limpeza.
+
+        Input: caminho do csv, teto de memória em MB
+        Output: número de linhas por bloco
+    """
+    df_sample = pd.read_csv( path, nrows=sample )
+    bytes_per_row = df_sample.memory_usage( deep=True ).sum() / max( len( df_sample ), 1 )
+
+    return max( int( float( max_memory_mb ) * 2**20 / ( bytes_per_row * CHUNK_OVERHEAD ) ), 1 )
+
+
+def read_chunks( path=DATASET_PATH, max_memory_mb=None ):
+    """ Lê o csv em blocos limitados pelo teto de memória e devolve cada bloco já limpo
+
+        Os lotes ingeridos (já limpos) são devolvidos depois do csv, um grupo
+        de linhas do parquet por vez (lotes juntados, ver compact_batches,
+        são gravados em grupos do tamanho de um bloco).
+
+        Input: caminho do csv, teto de memória em MB (padrão: CURRY_MAX_MEMORY_MB)
+        Output: gerador de Dataframes limpos (ver prepare)
+    """
+    max_memory_mb = max_memory_mb or MAX_MEMORY_MB or 512
+
+    # csv e lotes da versão lida aqui, que é a guardada com os agregados (ver consume)
+    version = dataset_version( path )
+    consume( version )
+
+    for chunk in pd.read_csv( path, chunksize=chunk_rows( path, max_memory_mb ) ):
+        yield prepare( chunk )
+
+    if len( version ) > 1:
+        # import local: sem lotes o modo streaming não depende do pyarrow
+        import pyarrow.parquet as pq
+
+        for batch in version[1:]:
+            with open_batch( batch ) as file:
+                parquet = pq.ParquetFile( file )
+                for group in range( parquet.num_row_groups ):
+                    yield parquet.read_row_group( group ).to_pandas()
+
+
+def register_stream( name, build, merge, size=len ):
+    """ Registra um agregado montado bloco a bloco no modo streaming (ver stream_aggregates)
+
+        build( bloco ) devolve o agregado parcial de um bloco limpo, merge( parciais )
+        junta parciais no mesmo formato e size( parcial ) mede um parcial em linhas.
+        O nome é o mesmo do updater do agregado (ver register_updater).
+    """
+    _STREAMS[name] = ( build, merge, size )
+
+
+def stream_aggregates( path=DATASET_PATH, names=None, max_memory_mb=None ):
+    """ Esta função monta os agregados registrados numa única leitura do csv em blocos
+
+        Cada bloco é lido e limpo uma única vez e alimenta todos os agregados.
+        Os parciais de um agregado se acumulam até somar metade do acumulado
+        e então são juntados de uma vez: cada junção custa o tamanho do
+        acumulado, e a memória fica limitada ao bloco mais uma vez e meia os
+        próprios agregados.
+
+        Input: caminho do csv, nomes (padrão: todos os registrados), teto de memória em MB
+        Output: dicionário nome -> agregado
+    """
+    names = list( _STREAMS ) if names is None else names
+    values, pending = dict.fromkeys( names ), { name: [] for name in names }
+
+    for chunk in read_chunks( path, max_memory_mb ):
+        for name in names:
+            build, merge, size = _STREAMS[name]
+            parts = pending[name]
+            parts.append( build( chunk ) )
+
+            if values[name] is None:
+                values[name] = parts.pop()
+            elif sum( size( part ) for part in parts ) * 2 >= size( values[name] ):
+                values[name] = merge( [values[name]] + parts )
+                parts.clear()
+
+    for name in names:
+        if pending[name]:
+            values[name] = _STREAMS[name][1]( [values[name]] + pending[name] )
+
+    return values
+
+
+def load_streamed( name, path=DATASET_PATH ):
+    """ Agregado registrado com register_stream, no modo streaming
+
+        Todos os agregados registrados saem da mesma leitura do csv, guardada
+        uma única vez por versão do dataset (ver memo). Um agregado registrado
+        depois dessa leitura (módulo importado mais tarde) é lido à parte.
+    """
+    values = memo( 'streaming', path, lambda: stream_aggregates( path ) )
+    if name in values:
+        return values[name]
+
+    return memo( name, path, lambda: stream_aggregates( path, [name] )[name] )
+
+
+def load_dataset( path=DATASET_PATH ):
+    """ Lê e limpa o dataset uma única vez por processo (ver memo)
+
+        A distância de cada entrega (coluna 'distance') é calculada aqui,
+        junto com a limpeza, e o resultado tipado fica gravado em parquet
+        (ver build_dataset) até o csv mudar. O dataframe retornado é
+        compartilhado entre sessões e páginas: quem precisar alterá-lo deve
+        trabalhar sobre uma cópia.
+
+        Input: caminho do csv
+        Output: Dataframe limpo
+    """
+    return memo( 'dataset', path, lambda: build_dataset( path ) )
+
+
+register_updater( 'dataset', lambda df1, delta: sort_by_date( concat_frames( [df1, delta] ) ) )
+register_updater( 'streaming', lambda values, delta: { name: _UPDATERS[name]( value, delta )
+                                                       for name, value in values.items() } )
+
+
+if __name__ == '__main__':
+    # python -m dashboard.data [caminho do csv]: mostra a memória por coluna antes/depois do schema
+    import sys
+
+    source = sys.argv[1] if len( sys.argv ) > 1 else DATASET_PATH
+    df_raw = add_distance( clean_code( pd.read_csv( source ) ) )
+
+    with pd.option_context( 'display.max_columns', None, 'display.width', 200 ):
+        print( memory_report( df_raw, apply_schema( df_raw.copy() ) ) )
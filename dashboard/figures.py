@@ -0,0 +1,137 @@
+# libraries
+
+import folium
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+from folium.plugins import FastMarkerCluster, HeatMap
+
+from dashboard import metrics
+from dashboard.charts import compact, downsample, drill
+from dashboard.geo import grid_clusters, sample_points
+
+
+# limites do mapa: marcadores desenhados no servidor e pontos enviados ao navegador
+MAX_MAP_MARKERS = 300
+MAX_MAP_POINTS = 20000
+
+# modos do mapa da Visão Geográfica (ver country_maps)
+MAP_MODES = ['Mediana por cidade e trânsito', 'Agrupamento em grade', 'Mapa de calor', 'Entregas individuais']
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def country_maps( df1, mode ):
+    """ Mapa das entregas com um número limitado de marcadores, qualquer que seja o volume (ver MAP_MODES) """
+    lat = df1['Delivery_location_latitude']
+    lon = df1['Delivery_location_longitude']
+
+    # Desenhar o mapa
+    map_ = folium.Map( zoom_start=11 )
+
+    if mode == 'Mediana por cidade e trânsito':
+        data_plot = metrics.city_traffic_medians( df1 )
+
+        for location_info in data_plot.itertuples( index=False ):
+            folium.Marker( [float( location_info[2] ), float( location_info[3] )],
+                    popup='{} / {}'.format( location_info[0], location_info[1] ) ).add_to( map_ )
+
+    elif mode == 'Agrupamento em grade':
+        cells = grid_clusters( lat, lon, max_cells=MAX_MAP_MARKERS )
+        radius = 3 + 2 * np.log1p( cells['count'].values )
+
+        for ( cell_lat, cell_lon, count ), r in zip( cells[['lat', 'lon', 'count']].itertuples( index=False ), radius ):
+            folium.CircleMarker( [cell_lat, cell_lon], radius=float( r ), popup='{} entregas'.format( count ),
+                                 fill=True, weight=1 ).add_to( map_ )
+
+    elif mode == 'Mapa de calor':
+        cells = grid_clusters( lat, lon, max_cells=MAX_MAP_MARKERS * 10 )
+        HeatMap( cells[['lat', 'lon', 'count']].round( 5 ).values.tolist() ).add_to( map_ )
+
+    else:
+        # entregas individuais, agrupadas no navegador (amostra limitada a MAX_MAP_POINTS)
+        FastMarkerCluster( sample_points( lat, lon, MAX_MAP_POINTS ) ).add_to( map_ )
+
+    if len( df1 ):
+        map_.fit_bounds( [[float( lat.min() ), float( lon.min() )], [float( lat.max() ), float( lon.max() )]] )
+
+    return map_
+
+
+def order_share_by_week( df_buckets ):
+    """ Quantidade de pedidos por entregador por período (entregas / entregadores únicos)
+
+        No máximo MAX_POINTS pontos, escolhidos por LTTB.
+    """
+    df_aux = downsample( df_buckets, 'label', 'order_by_delivery' )
+    fig = px.line( df_aux, x='label', y='order_by_delivery' )
+    return compact( fig )
+
+
+def order_by_week( df_buckets ):
+    """ Quantidade de pedidos por período (no máximo MAX_POINTS pontos, escolhidos por LTTB) """
+    df_aux = downsample( df_buckets, 'label', 'orders' )
+    fig = px.line( df_aux, x='label', y='orders' )
+    return compact( fig )
+
+
+def traffic_order_city( cells ):
+    """ Pedidos por cidade e trânsito """
+    df_aux = metrics.traffic_order_city( cells )
+
+    # gráfico
+    fig = px.scatter( df_aux, x='City', y='Road_traffic_density', size='ID', color='City' )
+    return compact( fig )
+
+
+def traffic_order_share( cells ):
+    """ Participação de cada trânsito nos pedidos """
+    df_aux = metrics.traffic_order_share( cells )
+
+    # gráfico
+    fig = px.pie( df_aux, values='perc_ID', names='Road_traffic_density' )
+    return compact( fig )
+
+
+def order_metric( cells, start=None, end=None ):
+    """ Quantidade de pedidos por dia, no intervalo escolhido """
+    df_aux = drill( metrics.orders_by_day( cells ), 'order_date', start, end )
+
+    # históricos longos viram no máximo MAX_POINTS barras (média de pedidos por dia em cada faixa de dias)
+    df_aux = downsample( df_aux, 'order_date', 'qtde_entregas', how='mean' )
+
+    # gráfico
+    fig = px.bar( df_aux, x='order_date', y='qtde_entregas' )
+    return compact( fig )
+
+
+def avg_std_time_on_traffic( cells ):
+    """ Tempo médio e desvio padrão de entrega por cidade e trânsito """
+    df_aux = metrics.avg_std_time( cells, ['City', 'Road_traffic_density'] )
+    fig = px.sunburst( df_aux, path=['City', 'Road_traffic_density'], values='avg_time',
+                       color='std_time', color_continuous_scale='RdBu',
+                       color_continuous_midpoint=np.average( df_aux['std_time'] ) )
+    return fig
+
+
+def avg_std_time_graph( cells ):
+    """ Tempo médio de entrega por cidade, com o desvio padrão como barra de erro """
+    df_aux = metrics.avg_std_time( cells, 'City' )
+    fig = go.Figure()
+    fig.add_trace( go.Bar( name='Control',
+                           x=df_aux['City'],
+                           y=df_aux['avg_time'],
+                           error_y=dict( type='data', array=df_aux['std_time'] ) ) )
+
+    fig.update_layout( barmode='group' )
+    return fig
+
+
+def distance( cells ):
+    """ Distância média por cidade, já agregada no cubo """
+    avg_distance = metrics.distance_by_city( cells )
+
+    fig = go.Figure( data=[go.Pie( labels=avg_distance['City'], values=avg_distance['distance'], pull=[0, 0.1, 0] )] )
+    return fig
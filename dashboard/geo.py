@@ -0,0 +1,179 @@
+# libraries
+
+import numpy as np
+import pandas as pd
+
+
+# mesmo raio médio usado pela biblioteca haversine
+EARTH_RADIUS_KM = 6371.0088
+
+RESTAURANT_COLUMNS = ['Restaurant_latitude', 'Restaurant_longitude']
+DELIVERY_COLUMNS = ['Delivery_location_latitude', 'Delivery_location_longitude']
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def haversine_np( lat1, lon1, lat2, lon2 ):
+    """ Distância de grande círculo (km) calculada sobre arrays inteiros
+
+        Input: arrays/Series de latitude e longitude de origem e destino, em graus
+        Output: array numpy com a distância em km
+    """
+    lat1, lon1, lat2, lon2 = ( np.radians( np.asarray( x, dtype=np.float64 ) )
+                               for x in ( lat1, lon1, lat2, lon2 ) )
+
+    d = ( np.sin( ( lat2 - lat1 ) * 0.5 ) ** 2
+        + np.cos( lat1 ) * np.cos( lat2 ) * np.sin( ( lon2 - lon1 ) * 0.5 ) ** 2 )
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin( np.sqrt( d ) )
+
+
+def add_distance( df1 ):
+    """ Grava a distância restaurante -> local de entrega na coluna 'distance'
+
+        Input: Dataframe limpo
+        Output: o mesmo Dataframe, com a coluna 'distance'
+    """
+    df1['distance'] = haversine_np( df1[RESTAURANT_COLUMNS[0]], df1[RESTAURANT_COLUMNS[1]],
+                                    df1[DELIVERY_COLUMNS[0]], df1[DELIVERY_COLUMNS[1]] )
+    return df1
+
+
+def grid_clusters( lat, lon, max_cells=500, cell_deg=0.005 ):
+    """ Agrupa pontos numa grade regular, com no máximo max_cells células ocupadas
+
+        Começa com células de cell_deg graus e dobra o tamanho até caberem
+        em max_cells. Cada célula vira um único ponto no centróide das
+        entregas que caíram nela.
+
+        Input: arrays de latitude e longitude, máximo de células, tamanho inicial (graus)
+        Output: Dataframe com 'lat', 'lon' (centróide), 'count' e o tamanho da célula em 'cell_deg'
+    """
+    lat = np.asarray( lat, dtype=np.float64 )
+    lon = np.asarray( lon, dtype=np.float64 )
+
+    while True:
+        rows = np.floor( ( lat + 90 ) / cell_deg ).astype( np.int64 )
+        cols = np.floor( ( lon + 180 ) / cell_deg ).astype( np.int64 )
+        keys = rows * ( int( 360 / cell_deg ) + 1 ) + cols
+
+        uniques, inverse = np.unique( keys, return_inverse=True )
+        if len( uniques ) <= max_cells:
+            break
+        cell_deg *= 2
+
+    count = np.bincount( inverse )
+    cells = pd.DataFrame( { 'lat': np.bincount( inverse, weights=lat ) / count,
+                            'lon': np.bincount( inverse, weights=lon ) / count,
+                            'count': count } )
+    cells['cell_deg'] = cell_deg
+
+    return cells
+
+
+def sample_points( lat, lon, max_points, seed=0 ):
+    """ Amostra uniforme de no máximo max_points pontos, como lista [[lat, lon], ...] """
+    points = np.column_stack( [np.asarray( lat, dtype=np.float64 ), np.asarray( lon, dtype=np.float64 )] )
+    if len( points ) > max_points:
+        points = points[np.random.default_rng( seed ).choice( len( points ), max_points, replace=False )]
+
+    return np.round( points, 5 ).tolist()
+
+
+# tamanho de um grau de latitude (km), usado para converter raios em células da grade
+KM_PER_DEGREE = 111.195
+
+
+def build_grid_index( lat, lon, cell_km=2.0 ):
+    """ Esta função monta um índice espacial em grade uniforme sobre as coordenadas
+
+        Cada ponto recebe a chave da sua célula (linha x coluna da grade em
+        graus); as posições ficam ordenadas pela chave, de modo que as células
+        de uma mesma linha da grade são um trecho contíguo encontrado por
+        busca binária. Consultas visitam só as células vizinhas ao raio.
+
+        Input: arrays de latitude e longitude, lado da célula em km
+        Output: dicionário com a grade ('cell_deg', 'width'), as chaves
+                ordenadas ('keys'), as posições ordenadas ('order'), a célula
+                de cada ponto ('cell') e as coordenadas
+    """
+    lat = np.asarray( lat, dtype=np.float64 )
+    lon = np.asarray( lon, dtype=np.float64 )
+    cell_deg = cell_km / KM_PER_DEGREE
+    width = int( np.ceil( 360 / cell_deg ) ) + 1
+
+    rows = np.floor( ( lat + 90 ) / cell_deg ).astype( np.int64 )
+    cols = np.floor( ( lon + 180 ) / cell_deg ).astype( np.int64 )
+    keys = rows * width + cols
+
+    order = np.argsort( keys, kind='stable' )
+    cells, cell = np.unique( keys, return_inverse=True )
+
+    return { 'cell_deg': cell_deg, 'width': width, 'keys': keys[order], 'order': order,
+             'cells': cells, 'cell': cell, 'lat': lat, 'lon': lon }
+
+
+def query_radius( index, lat, lon, km ):
+    """ Posições dos pontos a até km quilômetros de (lat, lon)
+
+        Input: índice (ver build_grid_index), coordenada do centro, raio em km
+        Output: array com as posições (na ordem do dataset) e array com as distâncias em km
+    """
+    cell_deg, width = index['cell_deg'], index['width']
+    dlat = km / KM_PER_DEGREE
+    dlon = km / ( KM_PER_DEGREE * max( np.cos( np.radians( min( abs( lat ) + dlat, 89.9 ) ) ), 1e-6 ) )
+
+    row0, row1 = ( int( np.floor( ( x + 90 ) / cell_deg ) ) for x in ( lat - dlat, lat + dlat ) )
+    col0, col1 = ( int( np.floor( ( x + 180 ) / cell_deg ) ) for x in ( lon - dlon, lon + dlon ) )
+
+    starts = np.searchsorted( index['keys'], np.arange( row0, row1 + 1 ) * width + col0, side='left' )
+    ends = np.searchsorted( index['keys'], np.arange( row0, row1 + 1 ) * width + col1, side='right' )
+
+    candidates = np.concatenate( [index['order'][a:b] for a, b in zip( starts, ends )] + [np.empty( 0, dtype=np.int64 )] )
+    dist = haversine_np( lat, lon, index['lat'][candidates], index['lon'][candidates] )
+    inside = dist <= km
+
+    positions = candidates[inside]
+    order = np.argsort( positions )
+
+    return positions[order], dist[inside][order]
+
+
+def cell_stats( index, values ):
+    """ Média de values por célula ocupada da grade, com o centro da célula
+
+        Input: índice (ver build_grid_index), array alinhado com os pontos indexados
+        Output: Dataframe com 'lat', 'lon' (centro da célula), 'count' e 'mean'
+    """
+    values = np.asarray( values, dtype=np.float64 )
+    count = np.bincount( index['cell'], minlength=len( index['cells'] ) )
+    total = np.bincount( index['cell'], weights=values, minlength=len( index['cells'] ) )
+
+    rows, cols = np.divmod( index['cells'], index['width'] )
+    cell_deg = index['cell_deg']
+
+    return pd.DataFrame( { 'lat': ( rows + 0.5 ) * cell_deg - 90,
+                           'lon': ( cols + 0.5 ) * cell_deg - 180,
+                           'count': count,
+                           'mean': total / count } )
+
+
+def restaurant_catchment( df1, quantile=0.9 ):
+    """ Área de atendimento de cada restaurante (coordenada distinta)
+
+        Input: Dataframe com as coordenadas, 'distance' e 'Time_taken(min)'
+        Output: Dataframe por restaurante com pedidos, distância média, raio
+                que cobre quantile das entregas e tempo médio
+    """
+    groups = df1.groupby( RESTAURANT_COLUMNS )
+    catchment = groups.agg( orders=( 'distance', 'size' ),
+                            avg_distance=( 'distance', 'mean' ),
+                            avg_time=( 'Time_taken(min)', 'mean' ) )
+    catchment.insert( 2, 'radius_km', groups['distance'].quantile( quantile ) )
+
+    catchment = ( catchment.reset_index()
+                           .sort_values( 'orders', ascending=False, kind='mergesort' )
+                           .reset_index( drop=True ) )
+
+    return catchment
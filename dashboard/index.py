@@ -0,0 +1,85 @@
+# libraries
+
+import numpy as np
+import pandas as pd
+
+from dashboard.data import DATASET_PATH, load_dataset, memo
+from dashboard.geo import DELIVERY_COLUMNS, RESTAURANT_COLUMNS, build_grid_index, cell_stats, restaurant_catchment
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def build_row_index( df1 ):
+    """ Esta função monta o índice usado pelos filtros da barra lateral
+
+        O dataset já vem ordenado por Order_Date (ver data.sort_by_date),
+        então o corte por data é uma busca binária nas datas. Para o
+        trânsito, guarda as posições (ordenadas) das linhas de cada categoria.
+
+        Input: Dataframe limpo, ordenado por Order_Date
+        Output: dicionário com 'dates' (datetime64) e 'traffic' (categoria -> posições)
+    """
+    codes, uniques = pd.factorize( df1['Road_traffic_density'] )
+    order = np.argsort( codes, kind='stable' )
+    bounds = np.searchsorted( codes[order], np.arange( len( uniques ) + 1 ) )
+
+    traffic = { value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate( uniques ) }
+
+    return { 'dates': df1['Order_Date'].values, 'traffic': traffic }
+
+
+def load_row_index( path=DATASET_PATH ):
+    """ Índice do dataset, construído uma única vez por versão do csv """
+    return memo( 'row_index', path, lambda: build_row_index( load_dataset( path ) ) )
+
+
+def filter_rows( df1, index, date_limit, traffic_options ):
+    """ Filtra Order_Date < date_limit e Road_traffic_density em traffic_options
+
+        Quando todos os trânsitos estão selecionados o resultado é uma fatia
+        (sem cópia) das primeiras linhas; senão, só as posições das categorias
+        escolhidas que ficam antes do corte são lidas. O resultado é
+        compartilhado com o cache: não deve ser alterado.
+
+        Input: Dataframe ordenado por data, índice (ver build_row_index),
+               data limite (exclusiva), lista de condições de trânsito
+        Output: Dataframe filtrado
+    """
+    end = np.searchsorted( index['dates'], np.datetime64( pd.Timestamp( date_limit ) ), side='left' )
+
+    if set( index['traffic'] ) <= set( traffic_options ):
+        return df1.iloc[:end]
+
+    parts = [ positions[:np.searchsorted( positions, end )]
+              for value, positions in index['traffic'].items() if value in traffic_options ]
+    if not parts:
+        return df1.iloc[:0]
+
+    return df1.take( np.sort( np.concatenate( parts ) ) )
+
+
+def load_grid_index( kind='delivery', path=DATASET_PATH ):
+    """ Índice espacial (ver geo.build_grid_index) das entregas ou dos restaurantes
+
+        Input: 'delivery' (local de entrega) ou 'restaurant', caminho do csv
+        Output: índice em grade, construído uma única vez por versão do csv
+    """
+    columns = DELIVERY_COLUMNS if kind == 'delivery' else RESTAURANT_COLUMNS
+
+    def builder():
+        df1 = load_dataset( path )
+        return build_grid_index( df1[columns[0]], df1[columns[1]] )
+
+    return memo( 'grid_' + kind, path, builder )
+
+
+def load_catchment( path=DATASET_PATH ):
+    """ Área de atendimento por restaurante (ver geo.restaurant_catchment), uma vez por versão do csv """
+    return memo( 'catchment', path, lambda: restaurant_catchment( load_dataset( path ) ) )
+
+
+def load_cell_times( path=DATASET_PATH ):
+    """ Tempo médio de entrega por célula da grade das entregas, uma vez por versão do csv """
+    return memo( 'cell_times', path,
+                 lambda: cell_stats( load_grid_index( 'delivery', path ), load_dataset( path )['Time_taken(min)'] ) )
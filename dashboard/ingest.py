@@ -0,0 +1,88 @@
+# libraries
+
+import os
+import time
+import argparse
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from dashboard.data import ( BATCH_DIR, COMPACT_BATCHES, DATASET_PATH, batch_paths, compact_batches, dataset_folder,
+                             prepare )
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def last_index( batch ):
+    """ Maior índice de linha de um lote, lido dos metadados do parquet (None se o lote estiver vazio) """
+    index = pq.read_schema( batch ).pandas_metadata['index_columns'][0]
+    if isinstance( index, dict ):
+        # RangeIndex: o parquet guarda só início, fim e passo
+        return index['stop'] - index['step'] if index['stop'] > index['start'] else None
+
+    values = pq.read_table( batch, columns=[index] ).column( index ).to_pandas()
+    return values.max() if len( values ) else None
+
+
+def next_index( path=DATASET_PATH ):
+    """ Primeiro índice de linha livre para um lote novo, sem carregar o dataset
+
+        As linhas do csv são numeradas pela posição (read_csv, também em
+        blocos), então o primeiro lote começa depois da quantidade de quebras
+        de linha do arquivo; os seguintes continuam do último lote gravado.
+    """
+    for batch in reversed( batch_paths( path ) ):
+        last = last_index( batch )
+        if last is not None:
+            return int( last ) + 1
+
+    with open( path, 'rb' ) as file:
+        return sum( block.count( b'\n' ) for block in iter( lambda: file.read( 2**20 ), b'' ) )
+
+
+def ingest_batch( batch, path=DATASET_PATH ):
+    """ Esta função acrescenta um lote de pedidos novos ao dataset sem relimpar o histórico
+
+        O lote (mesmo formato do train.csv) passa pelas mesmas regras de
+        clean_code, ganha a coluna de distância e é gravado em parquet na
+        pasta de lotes ao lado do csv. Os processos com valores já carregados
+        (dataset, cubo, ...) percebem a nova versão e os atualizam só com o
+        lote (ver data.memo). A cada CURRY_COMPACT_BATCHES lotes na pasta,
+        os lotes são juntados (ver data.compact_batches).
+
+        Input: caminho do csv do lote ou Dataframe bruto, caminho do dataset
+        Output: Dataframe do lote limpo
+    """
+    raw = pd.read_csv( batch ) if isinstance( batch, str ) else batch
+    delta = prepare( raw )
+
+    # continua a numeração das linhas do histórico
+    start = next_index( path )
+    delta.index = pd.RangeIndex( start, start + len( delta ) )
+
+    folder = dataset_folder( path, BATCH_DIR )
+    os.makedirs( folder, exist_ok=True )
+    # nome com o horário em nanossegundos: a ordem alfabética é a ordem de ingestão
+    target = os.path.join( folder, '{:020d}.parquet'.format( time.time_ns() ) )
+
+    tmp = target + '.tmp'
+    delta.to_parquet( tmp )
+    os.replace( tmp, target )
+
+    if len( batch_paths( path ) ) >= COMPACT_BATCHES:
+        compact_batches( path )
+
+    return delta
+
+
+if __name__ == '__main__':
+    # python -m dashboard.ingest lote.csv [lote2.csv ...] [--dataset dataset/train.csv]
+    parser = argparse.ArgumentParser( description='Acrescenta lotes de pedidos ao dataset do dashboard' )
+    parser.add_argument( 'batches', nargs='+', help='csv(s) com pedidos novos, no formato do train.csv' )
+    parser.add_argument( '--dataset', default=DATASET_PATH, help='csv de origem do dashboard' )
+    args = parser.parse_args()
+
+    for batch in args.batches:
+        delta = ingest_batch( batch, args.dataset )
+        print( '{}: {} pedidos válidos acrescentados'.format( batch, len( delta ) ) )
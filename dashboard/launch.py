@@ -0,0 +1,33 @@
+# libraries
+
+import sys
+
+from streamlit.web import cli
+
+from dashboard import warmup
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def main( args ):
+    """ Esta função sobe o Streamlit com o pré-cálculo já em andamento no mesmo processo
+
+        O Streamlit só executa o código das páginas quando alguém abre uma
+        delas, então com 'streamlit run' o pré-cálculo começaria na primeira
+        visita. Aqui a thread de pré-cálculo (ver dashboard.warmup) começa
+        antes do servidor, e as páginas encontram os valores nos mesmos caches
+        do processo (dashboard.data.memo, memoize).
+
+        Input: opções extras do 'streamlit run' (ex.: ['--server.port', '8501'])
+        Output: código de saída do Streamlit
+    """
+    warmup.start()
+
+    sys.argv = ['streamlit', 'run', 'Home.py'] + list( args )
+    return cli.main()
+
+
+if __name__ == '__main__':
+    # python -m dashboard.launch [opções do streamlit run], a partir da raiz do repositório
+    sys.exit( main( sys.argv[1:] ) )
@@ -0,0 +1,92 @@
+# libraries
+
+import os
+import threading
+
+from collections import OrderedDict
+
+from dashboard.data import DATASET_PATH, dataset_version
+from dashboard.profiling import stage
+
+
+# quantos resultados (figuras/tabelas) ficam guardados, somando todas as sessões
+CHART_CACHE_SIZE = int( os.environ.get( 'CURRY_CHART_CACHE_SIZE', 256 ) )
+
+
+# ----------------------------------------------
+# Classes
+# ----------------------------------------------
+class LRUCache:
+    """ Dicionário com tamanho máximo que descarta o item usado há mais tempo
+
+        É seguro para várias threads: o Streamlit atende cada sessão numa
+        thread, e todas compartilham a mesma instância do módulo.
+    """
+
+    def __init__( self, maxsize ):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get( self, key, default=None ):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._data.move_to_end( key )
+            return self._data[key]
+
+    def put( self, key, value ):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end( key )
+            while len( self._data ) > self.maxsize:
+                self._data.popitem( last=False )
+
+    def clear( self ):
+        with self._lock:
+            self._data.clear()
+
+    def __len__( self ):
+        return len( self._data )
+
+
+CHARTS = LRUCache( CHART_CACHE_SIZE )
+_MISSING = object()
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def filter_state( date_limit, traffic_options, path=DATASET_PATH ):
+    """ Chave do estado dos filtros: versão do dataset, data limite e trânsitos selecionados """
+    return ( dataset_version( path ), date_limit, tuple( sorted( traffic_options ) ) )
+
+
+def memoize( fn, state, *args, **kwargs ):
+    """ Executa fn( *args, **kwargs ) uma única vez por estado dos filtros
+
+        As páginas são reexecutadas a cada interação, então a função é
+        identificada pelo arquivo e nome, não pelo objeto. Os argumentos
+        posicionais não entram na chave e devem depender só de state (por
+        exemplo, os dados já filtrados); os argumentos nomeados entram.
+
+        Input: função, estado (ver filter_state), argumentos da função
+        Output: resultado de fn, possivelmente vindo do cache
+    """
+    key = ( fn.__code__.co_filename, fn.__qualname__, state, tuple( sorted( kwargs.items() ) ) )
+
+    result = CHARTS.get( key, _MISSING )
+    if result is _MISSING:
+        with stage( fn.__name__, cache='miss' ):
+            result = fn( *args, **kwargs )
+        CHARTS.put( key, result )
+    else:
+        with stage( fn.__name__, cache='hit' ):
+            pass
+
+    return result
@@ -0,0 +1,227 @@
+# libraries
+
+import numpy as np
+import pandas as pd
+
+from datetime import datetime
+
+from dashboard.aggregate import Metric, compute_metrics
+from dashboard.buckets import orders_by_bucket
+from dashboard.cube import load_cube, orders_by, select_cells, summarize
+from dashboard.data import DATASET_PATH, load_dataset, streaming_enabled
+from dashboard.index import filter_rows, load_row_index
+from dashboard.parallel import aggregate
+from dashboard.profiling import stage
+from dashboard.sketch import EXACT_UNIQUE, load_sketches, orders_by_bucket_approx, unique_count
+
+
+# filtros padrão da barra lateral das páginas
+DEFAULT_DATE = datetime( 2022, 4, 13 )
+TRAFFIC_OPTIONS = ['Low', 'Medium', 'High', 'Jam']
+
+# Métricas da linha de KPIs dos restaurantes, calculadas juntas (ver aggregate.compute_metrics)
+RESTAURANT_KPIS = [ Metric( 'avg_distance', 'mean', 'distance' ),
+                    Metric( 'avg_time_festival', 'mean', 'time', by='Festival', key='Yes' ),
+                    Metric( 'std_time_festival', 'std', 'time', by='Festival', key='Yes' ),
+                    Metric( 'avg_time_no_festival', 'mean', 'time', by='Festival', key='No' ),
+                    Metric( 'std_time_no_festival', 'std', 'time', by='Festival', key='No' ) ]
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def load_view( date_limit, traffic_options, path=DATASET_PATH ):
+    """ Dados de uma visão com os filtros da barra lateral aplicados
+
+        Input: data limite (exclusiva), condições de trânsito, caminho do csv
+        Output: (linhas filtradas, ou None no modo streaming; células do cubo filtradas)
+    """
+    df1 = None
+    if not streaming_enabled():
+        df_full, index = load_dataset( path ), load_row_index( path )
+        with stage( 'filter_rows' ):
+            # busca binária no dataset ordenado por data
+            df1 = filter_rows( df_full, index, date_limit, traffic_options )
+
+    cube = load_cube( path )
+    with stage( 'select_cells' ):
+        cells = select_cells( cube, date_limit, traffic_options )
+
+    return df1, cells
+
+
+# ------------------- Visão Empresa -------------------
+def orders_by_day( cells ):
+    """ Quantidade de pedidos por dia: 'order_date', 'qtde_entregas' """
+    df_aux = orders_by( cells, 'Order_Date' )
+    df_aux.columns = ['order_date', 'qtde_entregas']
+
+    return df_aux
+
+
+def traffic_order_share( cells ):
+    """ Pedidos por condição de trânsito: 'Road_traffic_density', 'ID' e 'perc_ID' (%) """
+    df_aux = orders_by( cells, 'Road_traffic_density' )
+    df_aux.columns = ['Road_traffic_density', 'ID']
+
+    df_aux['perc_ID'] = 100 * ( df_aux['ID'] / df_aux['ID'].sum() )
+
+    return df_aux
+
+
+def traffic_order_city( cells ):
+    """ Pedidos por cidade e trânsito: 'City', 'Road_traffic_density', 'ID' """
+    df_aux = orders_by( cells, ['City', 'Road_traffic_density'] )
+    df_aux.columns = ['City', 'Road_traffic_density', 'ID']
+
+    return df_aux
+
+
+def orders_by_period( cells, df1, date_limit, traffic_options, granularity='Semana', path=DATASET_PATH ):
+    """ Pedidos, entregadores únicos e pedidos por entregador por dia, semana ou mês
+
+        Os entregadores únicos vêm dos sketches (aproximados); com
+        CURRY_EXACT_UNIQUE=1 e as linhas carregadas, são contados em df1.
+
+        Output: Dataframe com 'bucket', 'label', 'orders', 'couriers' e 'order_by_delivery'
+    """
+    if EXACT_UNIQUE and df1 is not None:
+        return orders_by_bucket( df1, granularity )
+
+    return orders_by_bucket_approx( cells, load_sketches( path ), date_limit, traffic_options, granularity )
+
+
+def city_traffic_medians( df1 ):
+    """ Localização mediana das entregas por cidade e trânsito """
+    columns = ['City', 'Road_traffic_density', 'Delivery_location_latitude', 'Delivery_location_longitude']
+
+    return ( df1.loc[:, columns]
+                .groupby( ['City', 'Road_traffic_density'], observed=True )
+                .median()
+                .reset_index() )
+
+
+# ------------------- Visão Entregadores -------------------
+def courier_overview( df1 ):
+    """ Maior e menor idade dos entregadores e melhor e pior condição dos veículos (uma linha) """
+    return pd.DataFrame( { 'max_age': [df1['Delivery_person_Age'].max()],
+                           'min_age': [df1['Delivery_person_Age'].min()],
+                           'best_condition': [df1['Vehicle_condition'].max()],
+                           'worst_condition': [df1['Vehicle_condition'].min()] } )
+
+
+def rating_sums( df1 ):
+    """ Soma e quantidade das avaliações por entregador (agregação parcial de courier_ratings) """
+    return ( df1.groupby( 'Delivery_person_ID', observed=True )['Delivery_person_Ratings']
+                .agg( ['sum', 'count'] ) )
+
+
+def merge_rating_sums( partials ):
+    """ Junta as somas e quantidades parciais de rating_sums """
+    return pd.concat( partials ).groupby( level=0, observed=True ).sum()
+
+
+def courier_ratings( df1 ):
+    """ Avaliação média por entregador: 'Delivery_person_ID', 'Delivery_person_Ratings' """
+    df_aux = aggregate( rating_sums, merge_rating_sums, df1.loc[:, ['Delivery_person_ID', 'Delivery_person_Ratings']] )
+    df_aux['Delivery_person_Ratings'] = df_aux['sum'] / df_aux['count']
+
+    return df_aux.loc[:, ['Delivery_person_Ratings']].reset_index()
+
+
+def ratings_by( cells, by ):
+    """ Média e desvio padrão das avaliações por grupo: by, 'Delivery_mean', 'Delivery_std' """
+    df_aux = summarize( cells, by, 'rating' ).drop( columns='count' )
+
+    return df_aux.rename( columns={ 'mean': 'Delivery_mean', 'std': 'Delivery_std' } )
+
+
+def city_time_extremes( df1, n ):
+    """ Os n tempos de entrega mais rápidos e mais lentos de cada cidade
+
+        Agrupa uma única vez por cidade e tempo (sem ordenar) e seleciona
+        as pontas de cada cidade com nsmallest/nlargest, sem ordenar tudo.
+
+        Input: Dataframe com City, Time_taken(min) e Delivery_person_ID, quantidade por cidade
+        Output: (mais rápidos, mais lentos), Dataframes com City, Time_taken(min)
+                e Delivery_person_ID
+    """
+    df2 = ( df1.groupby( ['City', 'Time_taken(min)'], observed=True, sort=False )
+               .max()
+               .reset_index() )
+
+    fastest, slowest = [], []
+    groups = df2.groupby( 'City', observed=True ).indices
+    for city in sorted( groups ):
+        df_city = df2.take( groups[city] )
+        fastest.append( df_city.nsmallest( n, 'Time_taken(min)' ) )
+        slowest.append( df_city.nlargest( n, 'Time_taken(min)' ) )
+
+    if not fastest:
+        return df2, df2
+
+    df_fastest = pd.concat( fastest ).reset_index( drop=True )
+    df_slowest = pd.concat( slowest ).reset_index( drop=True )
+
+    return df_fastest, df_slowest
+
+
+def merge_city_time_extremes( partials, n ):
+    """ Junta os candidatos de cada partição (ver city_time_extremes)
+
+        Um tempo entre os n menores de uma cidade no total também está entre
+        os n menores de toda partição em que aparece, então basta selecionar
+        de novo sobre a união dos candidatos (idem para os maiores).
+    """
+    df_fastest = city_time_extremes( pd.concat( [fastest for fastest, _ in partials] ), n )[0]
+    df_slowest = city_time_extremes( pd.concat( [slowest for _, slowest in partials] ), n )[1]
+
+    return df_fastest, df_slowest
+
+
+def top_delivers( df1, n=10 ):
+    """ Os n tempos de entrega mais rápidos e mais lentos de cada cidade (em paralelo com CURRY_WORKERS)
+
+        Input: Dataframe filtrado, quantidade por cidade
+        Output: (mais rápidos, mais lentos), Dataframes com City, Time_taken(min)
+                e Delivery_person_ID
+    """
+    columns = ['Time_taken(min)', 'Delivery_person_ID', 'City']
+
+    return aggregate( city_time_extremes, merge_city_time_extremes, df1.loc[:, columns], n )
+
+
+# ------------------- Visão Restaurantes -------------------
+def avg_std_time( cells, by ):
+    """ Tempo médio e desvio padrão de entrega por grupo: by, 'avg_time', 'std_time' """
+    df_aux = summarize( cells, by, 'time' )
+    df_aux = df_aux.drop( columns='count' ).rename( columns={ 'mean': 'avg_time', 'std': 'std_time' } )
+
+    return df_aux
+
+
+def distance_by_city( cells ):
+    """ Distância média entre restaurante e entrega por cidade: 'City', 'distance' """
+    df_aux = summarize( cells, 'City', 'distance' ).drop( columns=['count', 'std'] )
+
+    return df_aux.rename( columns={ 'mean': 'distance' } )
+
+
+def unique_couriers( df1, date_limit, traffic_options, path=DATASET_PATH ):
+    """ Entregadores únicos no filtro (aproximado pelos sketches; exato com CURRY_EXACT_UNIQUE=1) """
+    if EXACT_UNIQUE and df1 is not None:
+        return int( df1['Delivery_person_ID'].nunique() )
+
+    return unique_count( load_sketches( path ), date_limit, traffic_options )
+
+
+def restaurant_kpis( cells, df1, date_limit, traffic_options, path=DATASET_PATH ):
+    """ Linha de KPIs dos restaurantes: entregadores únicos e as métricas de RESTAURANT_KPIS
+
+        Output: Dataframe de uma linha, valores arredondados em 2 casas
+    """
+    kpis = compute_metrics( RESTAURANT_KPIS, cells )
+    kpis = { name: np.round( value, 2 ) for name, value in kpis.items() }
+    kpis = dict( delivery_unique=unique_couriers( df1, date_limit, traffic_options, path ), **kpis )
+
+    return pd.DataFrame( [kpis] )
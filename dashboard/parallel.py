@@ -0,0 +1,78 @@
+# libraries
+
+import os
+import threading
+import multiprocessing
+
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+
+from dashboard.profiling import stage
+
+
+# CURRY_WORKERS=n agrega em n processos (0 = um por núcleo); o padrão 1 agrega no próprio processo
+WORKERS = int( os.environ.get( 'CURRY_WORKERS', 1 ) )
+
+# linhas mínimas por partição: abaixo disso enviar os dados aos processos custa mais que agregar
+PARTITION_ROWS = int( os.environ.get( 'CURRY_PARTITION_ROWS', 250_000 ) )
+
+# pool compartilhado pelo processo, criado na primeira agregação paralela
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def worker_count():
+    """ Quantidade de processos das agregações (ver CURRY_WORKERS) """
+    return WORKERS if WORKERS > 0 else os.cpu_count() or 1
+
+
+def get_pool():
+    """ Pool de processos do dashboard, criado uma única vez """
+    global _POOL
+
+    with _POOL_LOCK:
+        if _POOL is None:
+            # 'spawn' e não 'fork': o Streamlit e a API rodam várias threads, e um fork
+            # copiaria locks presos por outras threads (ex.: o cache de data.memo)
+            _POOL = ProcessPoolExecutor( worker_count(), mp_context=multiprocessing.get_context( 'spawn' ) )
+
+    return _POOL
+
+
+def partitions( df1, count ):
+    """ Divide df1 em count fatias contíguas de tamanho parecido
+
+        O dataset é ordenado por data (ver data.sort_by_date), então cada
+        fatia é um intervalo de datas.
+    """
+    bounds = np.linspace( 0, len( df1 ), count + 1 ).astype( int )
+
+    return [df1.iloc[start:stop] for start, stop in zip( bounds[:-1], bounds[1:] )]
+
+
+def aggregate( fn, merge, df1, *args ):
+    """ Esta função agrega df1 em paralelo: particiona, agrega cada parte e junta
+
+        fn( parte, *args ) devolve uma agregação parcial (contagens, somas,
+        momentos, candidatos a top-N) e merge( parciais, *args ) junta as
+        parciais no mesmo formato de fn. Com um único processo, ou poucas
+        linhas, devolve fn( df1, *args ) sem passar pelo pool.
+
+        fn e merge precisam ser funções de módulo (são enviadas aos processos).
+
+        Input: função parcial, função de junção, Dataframe, argumentos extras
+        Output: agregação de df1 inteiro, igual a fn( df1, *args )
+    """
+    count = min( worker_count(), len( df1 ) // PARTITION_ROWS )
+    if count <= 1:
+        return fn( df1, *args )
+
+    with stage( 'parallel:' + fn.__name__, partitions=count ):
+        parts = partitions( df1, count )
+        partials = list( get_pool().map( fn, parts, *[[arg] * count for arg in args] ) )
+
+        return merge( partials, *args )
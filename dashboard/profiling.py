@@ -0,0 +1,192 @@
+# libraries
+
+import os
+import json
+import time
+import logging
+import threading
+import tracemalloc
+
+from contextlib import contextmanager
+from datetime import datetime
+
+
+# CURRY_PROFILE=1 mede cada etapa das reexecuções das páginas e mostra o painel de depuração
+PROFILE = os.environ.get( 'CURRY_PROFILE' ) == '1'
+
+# CURRY_PROFILE_MEMORY=1 também mede o pico de memória alocada por etapa (tracemalloc, mais lento;
+# o contador é do processo, então com várias sessões simultâneas o valor é aproximado)
+PROFILE_MEMORY = os.environ.get( 'CURRY_PROFILE_MEMORY' ) == '1'
+
+# CURRY_PROFILE_LOG=arquivo grava uma linha JSON por etapa
+PROFILE_LOG = os.environ.get( 'CURRY_PROFILE_LOG' )
+
+# CURRY_TRACE_DIR=pasta grava um arquivo Chrome trace por reexecução (abrir em chrome://tracing ou Perfetto)
+TRACE_DIR = os.environ.get( 'CURRY_TRACE_DIR' )
+
+logger = logging.getLogger( 'curry.profile' )
+if PROFILE_LOG:
+    _handler = logging.FileHandler( PROFILE_LOG )
+    _handler.setFormatter( logging.Formatter( '%(message)s' ) )
+    logger.addHandler( _handler )
+    logger.setLevel( logging.INFO )
+
+# cada sessão do Streamlit roda numa thread: a execução ativa é guardada por thread
+_LOCAL = threading.local()
+_MEMORY_LOCK = threading.Lock()
+
+
+# ----------------------------------------------
+# Classes
+# ----------------------------------------------
+class Run:
+    """ Etapas medidas numa reexecução de uma página
+
+        Cada etapa vira um registro com nome, início e duração (ms, relativos
+        ao início da execução), profundidade (etapas podem ser aninhadas),
+        pico de memória (MB, se PROFILE_MEMORY) e atributos extras.
+    """
+
+    def __init__( self, page ):
+        self.page = page
+        self.started = time.perf_counter()
+        self.wall = time.time()
+        self.thread = threading.get_ident()
+        self.records = []
+        self.stack = []
+
+    def elapsed_ms( self ):
+        return ( time.perf_counter() - self.started ) * 1000
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def current_run():
+    """ Execução sendo medida nesta thread, ou None """
+    return getattr( _LOCAL, 'run', None )
+
+
+def start_run( page, enabled=None ):
+    """ Começa a medir uma reexecução da página (chamar no início do script)
+
+        Input: nome da página, ativa a medição (padrão: CURRY_PROFILE)
+        Output: Run, ou None quando a medição está desligada
+    """
+    enabled = PROFILE if enabled is None else enabled
+    run = Run( page ) if enabled else None
+    _LOCAL.run = run
+
+    if run is not None and PROFILE_MEMORY:
+        with _MEMORY_LOCK:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    return run
+
+
+@contextmanager
+def stage( name, **attrs ):
+    """ Mede o bloco como uma etapa da execução ativa (sem custo se nenhuma estiver ativa)
+
+        Input: nome da etapa, atributos extras gravados no registro (ex.: cache='hit')
+    """
+    run = current_run()
+    if run is None:
+        yield
+        return
+
+    record = { 'name': name, 'start_ms': run.elapsed_ms(), 'depth': len( run.stack ), **attrs }
+    memory = PROFILE_MEMORY and tracemalloc.is_tracing()
+    if memory:
+        # o pico da etapa pai até aqui fica guardado antes de zerar o contador
+        if run.stack:
+            run.stack[-1]['_peak'] = max( run.stack[-1].get( '_peak', 0 ), tracemalloc.get_traced_memory()[1] )
+        tracemalloc.reset_peak()
+
+    run.stack.append( record )
+    try:
+        yield
+    finally:
+        run.stack.pop()
+        record['duration_ms'] = run.elapsed_ms() - record['start_ms']
+        if memory:
+            peak = max( record.pop( '_peak', 0 ), tracemalloc.get_traced_memory()[1] )
+            record['peak_mb'] = peak / 2**20
+            if run.stack:
+                run.stack[-1]['_peak'] = max( run.stack[-1].get( '_peak', 0 ), peak )
+            tracemalloc.reset_peak()
+
+        run.records.append( record )
+        logger.info( json.dumps( { 'page': run.page, 'thread': run.thread, **record }, default=str ) )
+
+
+def timed( name, fn, *args, **kwargs ):
+    """ Executa fn( *args, **kwargs ) como uma etapa (ver stage) e devolve o resultado """
+    with stage( name ):
+        return fn( *args, **kwargs )
+
+
+def breakdown( run ):
+    """ Tabela das etapas de uma execução, na ordem em que começaram
+
+        Output: lista de dicionários com 'stage' (indentado pela profundidade),
+                'ms', '%' do total, 'MB' (quando medido) e 'KB' enviados (figuras)
+    """
+    total = max( run.elapsed_ms(), 1e-9 )
+    rows = []
+    for record in sorted( run.records, key=lambda r: r['start_ms'] ):
+        row = { 'stage': '  ' * record['depth'] + record['name'],
+                'ms': round( record['duration_ms'], 1 ),
+                '%': round( 100 * record['duration_ms'] / total, 1 ) }
+        if 'peak_mb' in record:
+            row['MB'] = round( record['peak_mb'], 1 )
+        if 'cache' in record:
+            row['cache'] = record['cache']
+        if 'payload' in record:
+            row['KB'] = round( record['payload'] / 1024, 1 )
+        rows.append( row )
+
+    return rows
+
+
+def chrome_trace( run ):
+    """ Eventos da execução no formato Chrome trace (eventos completos 'X', tempos em µs) """
+    events = [{ 'name': record['name'], 'ph': 'X', 'pid': os.getpid(), 'tid': run.thread,
+                'ts': int( ( run.wall * 1000 + record['start_ms'] ) * 1000 ),
+                'dur': int( record['duration_ms'] * 1000 ),
+                'args': { key: value for key, value in record.items()
+                          if key not in ( 'name', 'start_ms', 'duration_ms', 'depth' ) } }
+              for record in run.records]
+
+    return { 'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': { 'page': run.page } }
+
+
+def finish_run( run ):
+    """ Encerra a execução: grava o Chrome trace (se CURRY_TRACE_DIR) e devolve o tempo total (ms) """
+    if run is None:
+        return None
+
+    _LOCAL.run = None
+    total_ms = run.elapsed_ms()
+    logger.info( json.dumps( { 'page': run.page, 'thread': run.thread, 'name': 'rerun', 'duration_ms': total_ms } ) )
+
+    if TRACE_DIR:
+        os.makedirs( TRACE_DIR, exist_ok=True )
+        name = '{}-{}-{}.json'.format( run.page, datetime.fromtimestamp( run.wall ).strftime( '%Y%m%d-%H%M%S-%f' ), run.thread )
+        with open( os.path.join( TRACE_DIR, name ), 'w' ) as file:
+            json.dump( chrome_trace( run ), file )
+
+    return total_ms
+
+
+def debug_panel( run, total_ms ):
+    """ Painel de depuração na barra lateral com o tempo de cada etapa da última reexecução """
+    if run is None:
+        return
+
+    # import local: o restante do pacote não depende do Streamlit (API, benchmarks)
+    import streamlit as st
+
+    with st.sidebar.expander( 'Depuração: {:.0f} ms nesta execução'.format( total_ms ) ):
+        st.dataframe( breakdown( run ), use_container_width=True )
@@ -0,0 +1,222 @@
+# libraries
+
+import os
+import json
+import logging
+import hashlib
+import argparse
+
+from collections import namedtuple
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from dashboard import metrics, warmup
+from dashboard.buckets import GRANULARITIES
+from dashboard.data import DATASET_PATH
+from dashboard.lru import LRUCache, filter_state
+
+
+# quantas respostas JSON ficam guardadas (todas as combinações de filtros somadas)
+API_CACHE_SIZE = int( os.environ.get( 'CURRY_API_CACHE_SIZE', 256 ) )
+
+RESPONSES = LRUCache( API_CACHE_SIZE )
+
+logger = logging.getLogger( 'curry.server' )
+
+# parâmetros de uma consulta, já validados
+Query = namedtuple( 'Query', ['df1', 'cells', 'date_limit', 'traffic_options', 'granularity', 'n', 'path'] )
+
+# nome -> ( função( query ), precisa das linhas do dataset )
+VIEWS = {
+    'orders_by_day': ( lambda q: metrics.orders_by_day( q.cells ), False ),
+    'traffic_order_share': ( lambda q: metrics.traffic_order_share( q.cells ), False ),
+    'traffic_order_city': ( lambda q: metrics.traffic_order_city( q.cells ), False ),
+    'orders_by_period': ( lambda q: metrics.orders_by_period( q.cells, q.df1, q.date_limit, q.traffic_options,
+                                                              q.granularity, q.path ), False ),
+    'city_traffic_medians': ( lambda q: metrics.city_traffic_medians( q.df1 ), True ),
+    'courier_overview': ( lambda q: metrics.courier_overview( q.df1 ), True ),
+    'courier_ratings': ( lambda q: metrics.courier_ratings( q.df1 ), True ),
+    'ratings_by_traffic': ( lambda q: metrics.ratings_by( q.cells, 'Road_traffic_density' ), False ),
+    'ratings_by_weather': ( lambda q: metrics.ratings_by( q.cells, 'Weatherconditions' ), False ),
+    'top_delivers': ( lambda q: dict( zip( ['fastest', 'slowest'], metrics.top_delivers( q.df1, q.n ) ) ), True ),
+    'avg_std_time_by_city': ( lambda q: metrics.avg_std_time( q.cells, 'City' ), False ),
+    'avg_std_time_by_city_traffic': ( lambda q: metrics.avg_std_time( q.cells, ['City', 'Road_traffic_density'] ), False ),
+    'avg_std_time_by_city_order': ( lambda q: metrics.avg_std_time( q.cells, ['City', 'Type_of_order'] ), False ),
+    'distance_by_city': ( lambda q: metrics.distance_by_city( q.cells ), False ),
+    'restaurant_kpis': ( lambda q: metrics.restaurant_kpis( q.cells, q.df1, q.date_limit, q.traffic_options, q.path ), False ),
+}
+
+
+# ----------------------------------------------
+# Classes
+# ----------------------------------------------
+class RowsUnavailable( Exception ):
+    """ A visão precisa das linhas do dataset, que não são carregadas no modo streaming """
+
+
+class MetricsHandler( BaseHTTPRequestHandler ):
+    """ GET /metrics lista as visões; GET /metrics/<visão>?date=...&traffic=... devolve os dados
+
+        O ETag muda junto com a versão do dataset, então quem consulta com
+        If-None-Match recebe 304 enquanto nada mudou.
+    """
+
+    def do_GET( self ):
+        url = urlparse( self.path )
+        parts = [p for p in url.path.split( '/' ) if p]
+
+        if parts == ['metrics']:
+            self.send_json( 200, { 'metrics': sorted( VIEWS ) } )
+            return
+
+        if len( parts ) != 2 or parts[0] != 'metrics':
+            self.send_json( 404, { 'error': 'use /metrics ou /metrics/<visão>' } )
+            return
+
+        if parts[1] not in VIEWS:
+            self.send_json( 404, { 'error': 'visão desconhecida: {}'.format( parts[1] ) } )
+            return
+
+        try:
+            body, etag = render( parts[1], parse_qs( url.query ), self.server.dataset_path )
+        except ValueError as error:
+            self.send_json( 400, { 'error': str( error ) } )
+            return
+        except RowsUnavailable as error:
+            self.send_json( 503, { 'error': str( error ) } )
+            return
+        except Exception as error:
+            # sem isso o cliente recebe a conexão fechada, sem status nem corpo
+            logger.exception( 'falha ao montar a visão %s', parts[1] )
+            self.send_json( 500, { 'error': 'erro interno: {}'.format( error ) } )
+            return
+
+        if self.headers.get( 'If-None-Match' ) == etag:
+            self.send_response( 304 )
+            self.send_header( 'ETag', etag )
+            self.end_headers()
+            return
+
+        self.send_body( 200, body, etag )
+
+    def send_json( self, status, payload ):
+        self.send_body( status, json.dumps( payload, ensure_ascii=False ).encode( 'utf-8' ) )
+
+    def send_body( self, status, body, etag=None ):
+        self.send_response( status )
+        self.send_header( 'Content-Type', 'application/json; charset=utf-8' )
+        self.send_header( 'Content-Length', str( len( body ) ) )
+        if etag is not None:
+            self.send_header( 'ETag', etag )
+            self.send_header( 'Cache-Control', 'no-cache' )
+        self.end_headers()
+        self.wfile.write( body )
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def parse_filters( params ):
+    """ Lê e valida os parâmetros da URL
+
+        Input: dicionário do parse_qs (date=AAAA-MM-DD, traffic=Low,Jam, granularity=Semana, n=10)
+        Output: (data limite, trânsitos, granularidade, n); ValueError se algum for inválido
+    """
+    date_limit = datetime.strptime( params['date'][0], '%Y-%m-%d' ) if 'date' in params else metrics.DEFAULT_DATE
+
+    traffic_options = metrics.TRAFFIC_OPTIONS
+    if 'traffic' in params:
+        traffic_options = [t for value in params['traffic'] for t in value.split( ',' ) if t]
+        unknown = set( traffic_options ) - set( metrics.TRAFFIC_OPTIONS )
+        if unknown:
+            raise ValueError( 'trânsito desconhecido: {}'.format( ', '.join( sorted( unknown ) ) ) )
+
+    granularity = params.get( 'granularity', ['Semana'] )[0]
+    if granularity not in GRANULARITIES:
+        raise ValueError( 'granularidade deve ser uma de: {}'.format( ', '.join( GRANULARITIES ) ) )
+
+    n = int( params.get( 'n', [10] )[0] )
+    if n < 1:
+        raise ValueError( 'n deve ser maior que zero' )
+
+    return date_limit, traffic_options, granularity, n
+
+
+def to_records( result ):
+    """ Converte o resultado de uma visão (Dataframe ou dicionário de Dataframes) em estruturas JSON """
+    if isinstance( result, dict ):
+        return { name: to_records( value ) for name, value in result.items() }
+
+    return json.loads( result.to_json( orient='records', date_format='iso' ) )
+
+
+def render( name, params, path=DATASET_PATH ):
+    """ Resposta JSON de uma visão, calculada uma única vez por versão do dataset e filtros
+
+        Input: nome da visão em VIEWS, parâmetros da URL, caminho do csv
+        Output: (corpo em bytes, etag); ValueError para parâmetros inválidos,
+                RowsUnavailable se a visão precisar das linhas no modo streaming
+    """
+    view, needs_rows = VIEWS[name]
+    date_limit, traffic_options, granularity, n = parse_filters( params )
+
+    key = ( name, filter_state( date_limit, traffic_options, path ), granularity, n )
+    cached = RESPONSES.get( key )
+    if cached is not None:
+        return cached
+
+    df1, cells = metrics.load_view( date_limit, traffic_options, path )
+    if needs_rows and df1 is None:
+        raise RowsUnavailable( 'indisponível no modo streaming (CURRY_MAX_MEMORY_MB): esta visão precisa das linhas do dataset' )
+
+    query = Query( df1, cells, date_limit, traffic_options, granularity, n, path )
+    payload = { 'metric': name,
+                'filters': { 'date': date_limit.strftime( '%Y-%m-%d' ),
+                             'traffic': sorted( traffic_options ),
+                             'granularity': granularity,
+                             'n': n },
+                'data': to_records( view( query ) ) }
+
+    body = json.dumps( payload, ensure_ascii=False ).encode( 'utf-8' )
+    etag = '"{}"'.format( hashlib.sha1( repr( key ).encode() ).hexdigest() )
+    RESPONSES.put( key, ( body, etag ) )
+
+    return body, etag
+
+
+def warm_responses( path ):
+    """ Respostas de todas as visões com os filtros padrão (etapa do pré-cálculo, ver dashboard.warmup) """
+    for name in VIEWS:
+        try:
+            render( name, {}, path )
+        except RowsUnavailable:
+            continue
+
+
+def make_server( host='127.0.0.1', port=8502, path=DATASET_PATH ):
+    """ Servidor HTTP (uma thread por requisição) das visões do dashboard
+
+        Inicia também o pré-cálculo em segundo plano (CURRY_WARMUP, ver dashboard.warmup).
+    """
+    server = ThreadingHTTPServer( ( host, port ), MetricsHandler )
+    server.dataset_path = path
+    warmup.start( path )
+
+    return server
+
+
+warmup.register_step( 'api', warm_responses )
+
+
+if __name__ == '__main__':
+    # python -m dashboard.server [--host 127.0.0.1] [--port 8502] [--dataset dataset/train.csv]
+    parser = argparse.ArgumentParser( description='API JSON com as métricas do dashboard, sem Streamlit' )
+    parser.add_argument( '--host', default='127.0.0.1' )
+    parser.add_argument( '--port', type=int, default=8502 )
+    parser.add_argument( '--dataset', default=DATASET_PATH, help='csv de origem do dashboard' )
+    args = parser.parse_args()
+
+    server = make_server( args.host, args.port, args.dataset )
+    print( 'Servindo as métricas em http://{}:{}/metrics'.format( args.host, args.port ) )
+    server.serve_forever()
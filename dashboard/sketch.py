@@ -0,0 +1,178 @@
+# libraries
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from dashboard.buckets import GRANULARITIES, bucket_keys, orders_by_bucket_cells
+from dashboard.data import ( DATASET_PATH, concat_frames, load_dataset, load_streamed, memo,
+                             register_stream, register_updater, streaming_enabled )
+from dashboard.parallel import aggregate
+
+
+# erro relativo padrão das contagens aproximadas de entregadores únicos
+HLL_ERROR = float( os.environ.get( 'CURRY_HLL_ERROR', 0.02 ) )
+
+# CURRY_EXACT_UNIQUE=1 usa nunique nas linhas (validação), quando o dataset está carregado
+EXACT_UNIQUE = os.environ.get( 'CURRY_EXACT_UNIQUE' ) == '1'
+
+# um sketch por dia x trânsito x cidade: qualquer recorte dos filtros é uma união de sketches
+SKETCH_KEYS = ['Order_Date', 'Road_traffic_density', 'City']
+
+# colunas lidas pelos sketches: só elas vão para os processos de aggregate
+SKETCH_COLUMNS = SKETCH_KEYS + ['Delivery_person_ID']
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def precision_for_error( error ):
+    """ Precisão p (2^p registradores) cujo erro padrão 1.04 / sqrt(2^p) fica abaixo de error """
+    p = int( np.ceil( 2 * np.log2( 1.04 / error ) ) )
+    return min( max( p, 4 ), 16 )
+
+
+def bit_length( values ):
+    """ Quantidade de bits significativos de cada inteiro sem sinal (0 para zero) """
+    values = values.copy()
+    length = np.zeros( len( values ), dtype=np.int64 )
+    for shift in ( 32, 16, 8, 4, 2, 1 ):
+        large = values >= ( np.uint64( 1 ) << np.uint64( shift ) )
+        length[large] += shift
+        values[large] >>= np.uint64( shift )
+
+    return length + ( values > 0 )
+
+
+def hll_registers( hashes, p ):
+    """ Registrador e valor (posição do primeiro bit 1) de cada hash de 64 bits
+
+        Input: array uint64 de hashes, precisão p
+        Output: (índice do registrador, rho) como arrays
+    """
+    index = ( hashes >> np.uint64( 64 - p ) ).astype( np.int64 )
+    rest = hashes & ( ( np.uint64( 1 ) << np.uint64( 64 - p ) ) - np.uint64( 1 ) )
+    rho = ( 64 - p ) - bit_length( rest ) + 1
+
+    return index, rho.astype( np.uint8 )
+
+
+def estimate( registers ):
+    """ Estimativa HyperLogLog da cardinalidade (com correção para poucos valores)
+
+        Input: registradores de um sketch (1D) ou de vários (2D, um por linha)
+        Output: estimativa (float) ou array de estimativas
+    """
+    registers = np.atleast_2d( registers ).astype( np.float64 )
+    m = registers.shape[1]
+    alpha = 0.7213 / ( 1 + 1.079 / m )
+
+    raw = alpha * m * m / np.sum( 2.0 ** -registers, axis=1 )
+    zeros = np.sum( registers == 0, axis=1 )
+    small = ( raw <= 2.5 * m ) & ( zeros > 0 )
+    raw[small] = m * np.log( m / zeros[small] )
+
+    return raw if len( raw ) > 1 else raw[0]
+
+
+def build_sketches( df1, column='Delivery_person_ID', error=None ):
+    """ Esta função monta um sketch HyperLogLog de column para cada célula SKETCH_KEYS
+
+        Input: Dataframe limpo, coluna a contar, erro relativo desejado (padrão HLL_ERROR)
+        Output: dicionário com 'keys' (Dataframe das células), 'registers'
+                (uint8, uma linha por célula) e 'p'
+    """
+    p = precision_for_error( error or HLL_ERROR )
+    m = 1 << p
+
+    grouper = df1.groupby( SKETCH_KEYS, observed=True, sort=False )
+    cell = grouper.ngroup().values
+    keys = grouper.size().reset_index().loc[:, SKETCH_KEYS]
+
+    hashes = pd.util.hash_pandas_object( df1[column], index=False ).values
+    index, rho = hll_registers( hashes, p )
+
+    # maior rho por (célula, registrador)
+    best = pd.Series( rho ).groupby( cell.astype( np.int64 ) * m + index ).max()
+
+    registers = np.zeros( ( len( keys ), m ), dtype=np.uint8 )
+    registers.ravel()[best.index.values] = best.values
+
+    return { 'keys': keys, 'registers': registers, 'p': p }
+
+
+def merge_sketches( stores ):
+    """ Junta conjuntos de sketches (ex.: histórico + lote) com o máximo dos registradores por célula """
+    keys = concat_frames( [store['keys'] for store in stores] ).reset_index( drop=True )
+    registers = np.concatenate( [store['registers'] for store in stores] )
+
+    cell = keys.groupby( SKETCH_KEYS, observed=True, sort=False ).ngroup().values
+    merged = np.zeros( ( cell.max() + 1 if len( cell ) else 0, registers.shape[1] ), dtype=np.uint8 )
+    np.maximum.at( merged, cell, registers )
+
+    first = pd.Series( np.arange( len( cell ) ) ).groupby( cell ).first().values
+
+    return { 'keys': keys.take( first ).reset_index( drop=True ), 'registers': merged, 'p': stores[0]['p'] }
+
+
+def load_sketches( path=DATASET_PATH ):
+    """ Sketches de entregadores únicos, construídos uma única vez por versão do csv (em paralelo com CURRY_WORKERS) """
+    if streaming_enabled():
+        return load_streamed( 'sketches', path )
+
+    return memo( 'sketches', path, lambda: aggregate( build_sketches, merge_sketches, load_dataset( path ).loc[:, SKETCH_COLUMNS] ) )
+
+
+def select_sketches( store, date_limit, traffic_options ):
+    """ Máscara das células dentro dos filtros da barra lateral """
+    keys = store['keys']
+    return ( ( keys['Order_Date'] < date_limit ) & ( keys['Road_traffic_density'].isin( traffic_options ) ) ).values
+
+
+def unique_count( store, date_limit, traffic_options ):
+    """ Quantidade aproximada de valores distintos no recorte dos filtros
+
+        Input: sketches (ver load_sketches), data limite (exclusiva), condições de trânsito
+        Output: inteiro estimado (0 se nenhuma célula for selecionada)
+    """
+    selected = select_sketches( store, date_limit, traffic_options )
+    if not selected.any():
+        return 0
+
+    return int( round( estimate( store['registers'][selected].max( axis=0 ) ) ) )
+
+
+def unique_by_bucket( store, date_limit, traffic_options, granularity='Semana' ):
+    """ Quantidade aproximada de valores distintos por período (dia, semana ou mês)
+
+        Output: Series indexada pela chave inteira do período (ver buckets.bucket_keys)
+    """
+    selected = select_sketches( store, date_limit, traffic_options )
+    keys = bucket_keys( store['keys'].loc[selected, 'Order_Date'] )[GRANULARITIES[granularity]].values
+    registers = store['registers'][selected]
+
+    buckets = np.unique( keys )
+    merged = np.stack( [registers[keys == bucket].max( axis=0 ) for bucket in buckets] ) if len( buckets ) else registers[:0]
+
+    return pd.Series( np.round( np.atleast_1d( estimate( merged ) ) ).astype( np.int64 ) if len( buckets ) else [],
+                      index=pd.Index( buckets, name='bucket' ), dtype=np.int64 )
+
+
+def orders_by_bucket_approx( cells, store, date_limit, traffic_options, granularity='Semana' ):
+    """ Mesmo resultado de buckets.orders_by_bucket, com pedidos do cubo e entregadores dos sketches
+
+        Input: células do cubo filtradas, sketches, filtros da barra lateral, granularidade
+        Output: Dataframe com 'bucket', 'label', 'orders', 'couriers' e 'order_by_delivery'
+    """
+    df_aux = orders_by_bucket_cells( cells, granularity )
+    couriers = unique_by_bucket( store, date_limit, traffic_options, granularity )
+
+    df_aux['couriers'] = couriers.reindex( df_aux['bucket'].values ).values
+    df_aux['order_by_delivery'] = df_aux['orders'] / df_aux['couriers']
+
+    return df_aux
+
+
+register_updater( 'sketches', lambda store, delta: merge_sketches( [store, build_sketches( delta )] ) )
+register_stream( 'sketches', build_sketches, merge_sketches, lambda store: len( store['keys'] ) )
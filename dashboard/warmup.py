@@ -0,0 +1,180 @@
+# libraries
+
+import os
+import time
+import logging
+import threading
+
+from dashboard import metrics
+from dashboard.couriers import load_profile_table
+from dashboard.cube import load_cube
+from dashboard.data import DATASET_PATH, dataset_version, load_dataset, streaming_enabled
+from dashboard.index import load_catchment, load_cell_times, load_grid_index, load_row_index
+from dashboard.lru import filter_state, memoize
+from dashboard.sketch import load_sketches
+
+
+# CURRY_WARMUP=0 desliga o pré-cálculo em segundo plano
+WARMUP = os.environ.get( 'CURRY_WARMUP', '1' ) != '0'
+
+# intervalo (s) entre as verificações de mudança no dataset (csv regravado ou lotes novos)
+WARMUP_INTERVAL = float( os.environ.get( 'CURRY_WARMUP_INTERVAL', 5 ) )
+
+logger = logging.getLogger( 'curry.warmup' )
+
+# etapas extras registradas por outros módulos: (nome, step( path ), precisa das linhas)
+_STEPS = []
+
+# uma thread e um progresso por dataset: caminho absoluto -> thread / dicionário (ver status)
+_WORKERS = {}
+_STATUS = {}
+_LOCK = threading.Lock()
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def register_step( name, step, needs_rows=False ):
+    """ Registra uma etapa extra do pré-cálculo (ex.: respostas da API, ver dashboard.server)
+
+        step( path ) deve guardar o resultado num cache compartilhado do processo.
+    """
+    _STEPS.append( ( name, step, needs_rows ) )
+
+
+def default_views( path ):
+    """ Calcula, com os filtros padrão, as visões de metrics que as páginas guardam com memoize
+
+        As chamadas repetem as das páginas (mesma função, estado e argumentos
+        nomeados), então a primeira visita já encontra os resultados no cache.
+        Só vale para o dataset das páginas (DATASET_PATH); as figuras (ver
+        dashboard.figures) são baratas a partir do cubo e não entram aqui.
+    """
+    if os.path.abspath( path ) != os.path.abspath( DATASET_PATH ):
+        return
+
+    date_limit, traffic_options = metrics.DEFAULT_DATE, metrics.TRAFFIC_OPTIONS
+    # estado antes dos dados, como nas páginas
+    state = filter_state( date_limit, traffic_options )
+    df1, cells = metrics.load_view( date_limit, traffic_options )
+
+    # Visão Empresa
+    memoize( metrics.orders_by_period, state, cells, df1, date_limit, traffic_options, granularity='Semana' )
+
+    # Visão Entregadores
+    memoize( metrics.ratings_by, state, cells, by='Road_traffic_density' )
+    memoize( metrics.ratings_by, state, cells, by='Weatherconditions' )
+    if df1 is not None:
+        memoize( metrics.courier_overview, state, df1 )
+        memoize( metrics.top_delivers, state, df1 )
+
+    # Visão Restaurantes
+    memoize( metrics.restaurant_kpis, state, cells, df1, date_limit, traffic_options )
+
+
+def steps():
+    """ Etapas do pré-cálculo, na ordem: (nome, step( path ), precisa das linhas) """
+    return [( 'dataset', load_dataset, True ),
+            ( 'row_index', load_row_index, True ),
+            ( 'cube', load_cube, False ),
+            ( 'sketches', load_sketches, False ),
+            ( 'courier_profiles', load_profile_table, False ),
+            ( 'grid_index', lambda path: load_grid_index( 'delivery', path ), True ),
+            ( 'catchment', load_catchment, True ),
+            ( 'cell_times', load_cell_times, True ),
+            ( 'default_views', default_views, False )] + _STEPS
+
+
+def status( path=DATASET_PATH ):
+    """ Progresso do pré-cálculo do dataset
+
+        Output: dicionário com 'state' ('idle', 'running', 'done' ou 'error'),
+                'step' (etapa atual), 'done' e 'total' (etapas), 'version'
+                (versão do dataset), 'seconds' (duração) e 'error'
+    """
+    with _LOCK:
+        progress = _STATUS.get( os.path.abspath( path ), {} )
+        return { 'state': 'idle', 'step': None, 'done': 0, 'total': 0,
+                 'version': None, 'seconds': None, 'error': None, **progress }
+
+
+def update( path, **values ):
+    """ Atualiza o progresso do pré-cálculo do dataset (ver status) """
+    with _LOCK:
+        _STATUS.setdefault( os.path.abspath( path ), {} ).update( values )
+
+
+def warm( path=DATASET_PATH ):
+    """ Esta função executa todas as etapas do pré-cálculo para a versão atual do dataset
+
+        Cada etapa passa pelos caches compartilhados (memo, memoize, LRU da
+        API): valores já construídos para esta versão saem na hora, então
+        repetir o pré-cálculo só refaz o que mudou. No modo streaming as
+        etapas que precisam das linhas são puladas.
+
+        Input: caminho do csv
+        Output: duração (s)
+    """
+    todo = [( name, step ) for name, step, needs_rows in steps() if not ( needs_rows and streaming_enabled() )]
+
+    started = time.perf_counter()
+    update( path, state='running', version=dataset_version( path ), done=0, total=len( todo ), error=None )
+    for i, ( name, step ) in enumerate( todo ):
+        update( path, step=name, done=i )
+        step( path )
+
+    seconds = time.perf_counter() - started
+    update( path, state='done', step=None, done=len( todo ), seconds=round( seconds, 3 ) )
+    logger.info( 'pré-cálculo de %s concluído em %.1f s', path, seconds )
+
+    return seconds
+
+
+def watch( path=DATASET_PATH ):
+    """ Laço da thread de pré-cálculo: no início e sempre que a versão do dataset mudar """
+    warmed = None
+    while True:
+        try:
+            version = dataset_version( path )
+            if version != warmed:
+                warmed = version
+                warm( path )
+        except Exception as error:
+            # a thread não pode morrer: tenta de novo quando o dataset mudar (ex.: csv sendo regravado)
+            if status( path )['error'] != repr( error ):
+                logger.exception( 'falha no pré-cálculo de %s', path )
+            update( path, state='error', step=None, error=repr( error ) )
+
+        time.sleep( WARMUP_INTERVAL )
+
+
+def start( path=DATASET_PATH, enabled=None ):
+    """ Inicia a thread de pré-cálculo do dataset, uma única vez por processo
+
+        Pode ser chamada a cada reexecução das páginas: só a primeira chamada
+        cria a thread, as demais só leem o progresso.
+
+        Input: caminho do csv, liga o pré-cálculo (padrão: CURRY_WARMUP)
+        Output: progresso atual (ver status)
+    """
+    enabled = WARMUP if enabled is None else enabled
+    source = os.path.abspath( path )
+
+    with _LOCK:
+        if enabled and source not in _WORKERS:
+            worker = threading.Thread( target=watch, args=( path, ), name='curry-warmup', daemon=True )
+            _WORKERS[source] = worker
+            worker.start()
+
+    return status( path )
+
+
+def progress_message( progress ):
+    """ Texto do progresso para a barra lateral, ou None se não houver pré-cálculo em andamento ou falha """
+    if progress['state'] == 'running':
+        return 'Pré-calculando {step} ({done}/{total})'.format( **progress )
+
+    if progress['state'] == 'error':
+        return 'Pré-cálculo falhou: {error}'.format( **progress )
+
+    return None
@@ -1,111 +1,25 @@
 # libraries
 
-import folium
-import pandas as pd
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 
 from PIL import Image
+from dashboard import metrics, warmup
+from dashboard.couriers import SORT_OPTIONS, load_profile_table, page_profiles
+from dashboard.lru import filter_state, memoize
+from dashboard.profiling import debug_panel, finish_run, stage, start_run
 from datetime import datetime
-from haversine import haversine
-from streamlit_folium import folium_static
 
 
 st.set_page_config( page_title='Visão Entregadores', page_icon='🛵', layout='wide' )
 
+# mede as etapas desta reexecução (CURRY_PROFILE=1, ver dashboard.profiling)
+run = start_run( 'visao_entregadores' )
 
-# ----------------------------------------------
-# Funções
-# ----------------------------------------------
-def top_delivers( df1, top_asc ):
-            
-    df2 = ( df1.loc[:, ['Time_taken(min)', 'Delivery_person_ID', 'City']]
-               .groupby(['City', 'Time_taken(min)'] )
-               .max()
-               .sort_values( ['City', 'Time_taken(min)'], ascending=top_asc )
-               .reset_index() )
-
-    df_aux01 = df2.loc[df2['City'] == 'Metropolitian', :].head(10)
-    df_aux02 = df2.loc[df2['City'] == 'Urban', :].head(10)
-    df_aux03 = df2.loc[df2['City'] == 'Semi-Urban', :].head(10)
-
-    df3 = pd.concat( [df_aux01, df_aux02, df_aux03] ).reset_index( drop=True )
-                
-    return df3
-
-def clean_code( df1 ):
-    """ Está funcao tem a responsabilidade de limpar o dataframe 
-        
-        Tipos de limpeza: 
-        1. Remoção dos dados NaN
-        2. Mudança do tipo da coluna de dados
-        3. Remoção dos espaços das variáveis de texto
-        4. Formatação da coluna de datas
-        5. Limpeza da coluna de tempo (remoção do texto da variável numérica)
-        
-        Input: Dataframe
-        Output: Dataframe
-    """
-    
-    # 1. convertendo a coluna Age de texto para número
-    linhas_selecionadas = df1['Delivery_person_Age'] != 'NaN '
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
-
-    # 2. convertendo a coluna Ratings de texto para número decimal (float)
-    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
-
-    # 3. convertendo a coluna Order_Date de texto para data
-    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format='%d-%m-%Y')
-
-    # 4. convertendo a coluna multiple_deliveries de texto para número
-    linhas_selecionadas = df1['multiple_deliveries'] != 'NaN '
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
-
-    # 5. removendo os espaços dentro de string/texto/object
-    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
-    df1.loc[:, 'Delivery_person_ID'] = df1.loc[:, 'Delivery_person_ID'].str.strip()
-    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
-    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
-    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
-    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
-    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
-
-    # 6. removendo dados faltantes
-    linhas_selecionadas = df1['Delivery_person_Ratings'] != 'NaN'
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    linhas_selecionadas = df1['Weatherconditions'] != 'NaN'
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    linhas_selecionadas = df1['Road_traffic_density'] != 'NaN'
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    linhas_selecionadas = df1['City'] != 'NaN'
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    linhas_selecionadas = df1['Festival'] != 'NaN'
-    df1 = df1.loc[linhas_selecionadas, :].copy()
-
-    # 7. limpando a coluna de time taken
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply(lambda x: x.split( '(min) ')[1])
-    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
-    
-    return df1
 
 # ===================================================================================================
 # --------------------------------- Inicio da Estrutura lógica do código ----------------------------
 # ===================================================================================================
 
-# import dataset
-df = pd.read_csv('dataset/train.csv')
-
-# cleaning dataset
-df1 = clean_code( df )
-
-
 # =======================================
 # Barra Lateral
 # =======================================
@@ -138,98 +52,133 @@ traffic_options = st.sidebar.multiselect(
 st.sidebar.markdown( """---""" )
 st.sidebar.markdown( '### Powered by Comunidade DS' )
 
-# Filtro de data
-linhas_selecionadas = df1['Order_Date'] < date_slider
-df1 = df1.loc[linhas_selecionadas, :]
+# pré-cálculo em segundo plano do dataset, cubo e visões padrão (CURRY_WARMUP, ver dashboard.warmup)
+warmup_message = warmup.progress_message( warmup.start() )
+if warmup_message:
+    st.sidebar.caption( warmup_message )
 
-# Filtro de transito
-linhas_selecionadas = df1['Road_traffic_density'].isin( traffic_options )
-df1 = df1.loc[linhas_selecionadas, :]
+# Chave dos resultados guardados em cache (versão do dataset + filtros), lida antes dos dados:
+# se o dataset mudar no meio, dados novos ficam numa chave antiga, nunca o contrário
+state = filter_state( date_slider, traffic_options )
+
+# Filtros de data e de trânsito sobre as linhas (None no modo streaming) e sobre o cubo
+with stage( 'load_view' ):
+    df1, cells = metrics.load_view( date_slider, traffic_options )
 
 
 # =======================================
 # Layout no Streamlit
 # =======================================
 
-tab1, tab2, tab3 = st.tabs( ['Visão Gerencial', '-', '-'] )
+# só a seção escolhida é calculada (st.tabs executaria todas a cada reexecução)
+section = st.radio( 'Seção', ['Visão Gerencial', 'Perfis'], horizontal=True, label_visibility='collapsed' )
 
-with tab1:
+if section == 'Visão Gerencial':
     with st.container():
         st.title( 'Overall Metrics' )
         
         col1, col2, col3, col4 = st.columns( 4, gap='large' )
+
+        # idades e condições dos veículos (precisam das linhas do dataset)
+        overview = { 'max_age': '-', 'min_age': '-', 'best_condition': '-', 'worst_condition': '-' }
+        if df1 is not None:
+            overview = memoize( metrics.courier_overview, state, df1 ).loc[0].to_dict()
         
         with col1:
             # A maior idade dos entregadores
-            maior_idade = df1.loc[:, "Delivery_person_Age"].max()
-            col1.metric( 'Maior idade (anos)', maior_idade )
+            col1.metric( 'Maior idade (anos)', overview['max_age'] )
 
         with col2:
             # A menor idade dos entregadores
-            menor_idade = df1.loc[:, "Delivery_person_Age"].min()
-            col2.metric( 'Menor idade (anos)', menor_idade )
+            col2.metric( 'Menor idade (anos)', overview['min_age'] )
             
         with col3:
             # A melhor condição dos veículos
-            melhor_condicao = df1.loc[:, "Vehicle_condition"].max()
-            col3.metric( 'Melhor condição', melhor_condicao )
+            col3.metric( 'Melhor condição', overview['best_condition'] )
 
         with col4:
             # A pior condição dos veículos
-            pior_condicao = df1.loc[:, "Vehicle_condition"].min()
-            col4.metric( 'Pior condição', pior_condicao )
+            col4.metric( 'Pior condição', overview['worst_condition'] )
     
     with st.container():
         st.markdown( """---""" )
         st.title( 'Avaliações' )
         
+        # a avaliação por entregador está na seção Perfis (tabela paginada)
         col1, col2 = st.columns( 2 )
         
         with col1:
-            st.markdown( '##### Avaliação média por Entregador' )
-            mean_delivery_ratings = ( df1.loc[:, ['Delivery_person_ID', 'Delivery_person_Ratings']]
-                                         .groupby('Delivery_person_ID')
-                                         .mean()
-                                         .reset_index())
-            st.dataframe( mean_delivery_ratings )
-            
-        with col2:
             st.markdown( '##### Avaliação média por trânsito' )
-            df_avg_std_rating_by_traffic = ( df1.loc[:, ['Delivery_person_Ratings', 'Road_traffic_density']]
-                                                    .groupby( 'Road_traffic_density' )
-                                                    .agg( {'Delivery_person_Ratings': ['std', 'mean']} ) )
-
-            # mudança de nome das colunas
-            df_avg_std_rating_by_traffic.columns = ['Delivery_std', 'Delivery_mean']
-            # reset index
-            df_avg_std_rating_by_traffic.reset_index()
-            st.dataframe( df_avg_std_rating_by_traffic )
+            df_avg_std_rating_by_traffic = ( memoize( metrics.ratings_by, state, cells, by='Road_traffic_density' )
+                                                    .set_index( 'Road_traffic_density' )
+                                                    .loc[:, ['Delivery_std', 'Delivery_mean']] )
+            with stage( 'render:ratings_by_traffic' ):
+                st.dataframe( df_avg_std_rating_by_traffic )
 
+        with col2:
             st.markdown( '##### Avaliação média por clima' )
-            std_mean_ratings_per_weather = ( df1.loc[:, ['Delivery_person_Ratings', 'Weatherconditions']]
-                                            .groupby( 'Weatherconditions' )
-                                            .agg( {'Delivery_person_Ratings': ['mean', 'std']} ) )
-
-            # mudança de nome das colunas
-            std_mean_ratings_per_weather.columns = ['Delivery_mean', 'Delivery_std']
-            # reset_index
-            std_mean_ratings_per_weather.reset_index()
-            st.dataframe( std_mean_ratings_per_weather )
+            std_mean_ratings_per_weather = ( memoize( metrics.ratings_by, state, cells, by='Weatherconditions' )
+                                            .set_index( 'Weatherconditions' )
+                                            .loc[:, ['Delivery_mean', 'Delivery_std']] )
+            with stage( 'render:ratings_by_weather' ):
+                st.dataframe( std_mean_ratings_per_weather )
     
     with st.container():
         st.markdown( """---""" )
         st.title( 'Velocidade de Entrega' )
             
-        col1, col2 = st.columns( 2 )
+        if df1 is None:
+            st.info( 'Indisponível no modo streaming (CURRY_MAX_MEMORY_MB): esta visão precisa das linhas do dataset.' )
+        else:
+            col1, col2 = st.columns( 2 )
+            df_fastest, df_slowest = memoize( metrics.top_delivers, state, df1 )
         
-        with col1:
-            st.markdown( '##### Top entregadores mais rápidos' )
-            df3 = top_delivers( df1, top_asc=True )
-            st.dataframe( df3 )
+            with col1:
+                st.markdown( '##### Top entregadores mais rápidos' )
+                with stage( 'render:top_fastest' ):
+                    st.dataframe( df_fastest )
         
-        with col2:
-            st.markdown( '##### Top entregadores mais lentos' )
-            df3 = top_delivers( df1, top_asc=False )
-            st.dataframe( df3 )
+            with col2:
+                st.markdown( '##### Top entregadores mais lentos' )
+                with stage( 'render:top_slowest' ):
+                    st.dataframe( df_slowest )
+
+
+elif section == 'Perfis':
+    st.title( 'Perfil dos Entregadores' )
+    st.caption( 'Histórico completo do dataset (não usa os filtros da barra lateral).' )
+
+    # tabela materializada uma vez por versão do dataset (ver dashboard.couriers); busca,
+    # ordenação e paginação rodam aqui, só a página escolhida vai para o navegador
+    with stage( 'load_profiles' ):
+        profiles = load_profile_table()
+
+    col1, col2, col3, col4, col5 = st.columns( [3, 2, 1, 1, 1] )
+
+    with col1:
+        search = st.text_input( 'Buscar entregador', placeholder='ex.: RES05DEL01' )
+
+    with col2:
+        sort_label = st.selectbox( 'Ordenar por', list( SORT_OPTIONS ) )
+
+    with col3:
+        ascending = st.checkbox( 'Crescente' )
+
+    with col4:
+        page_size = st.selectbox( 'Linhas', [25, 50, 100], index=1 )
+
+    with col5:
+        page = st.number_input( 'Página', min_value=1, value=1, step=1 )
+
+    with stage( 'page_profiles' ):
+        rows, total = page_profiles( profiles, search.strip(), SORT_OPTIONS[sort_label], ascending, page, page_size )
+
+    # uma página além da última (ex.: depois de uma busca) mostra a última
+    pages = max( -( -total // page_size ), 1 )
+    st.caption( '{} entregadores encontrados, página {} de {}'.format( total, min( page, pages ), pages ) )
+    with stage( 'render:profiles' ):
+        st.dataframe( rows, use_container_width=True )
+
 
-                
+# painel de depuração com o tempo de cada etapa (só com CURRY_PROFILE=1)
+debug_panel( run, finish_run( run ) )
@@ -0,0 +1,91 @@
+# libraries
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate, write_csv
+from dashboard.data import clean_code
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def baseline_clean_code( df1 ):
+    """ clean_code original das páginas, antes da máscara única (referência do teste) """
+
+    # 1. convertendo a coluna Age de texto para número
+    linhas_selecionadas = df1['Delivery_person_Age'] != 'NaN '
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+    df1['Delivery_person_Age'] = df1['Delivery_person_Age'].astype(int)
+
+    # 2. convertendo a coluna Ratings de texto para número decimal (float)
+    df1['Delivery_person_Ratings'] = df1['Delivery_person_Ratings'].astype(float)
+
+    # 3. convertendo a coluna Order_Date de texto para data
+    df1['Order_Date'] = pd.to_datetime(df1['Order_Date'], format='%d-%m-%Y')
+
+    # 4. convertendo a coluna multiple_deliveries de texto para número
+    linhas_selecionadas = df1['multiple_deliveries'] != 'NaN '
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+    df1['multiple_deliveries'] = df1['multiple_deliveries'].astype(int)
+
+    # 5. removendo os espaços dentro de string/texto/object
+    df1.loc[:, 'ID'] = df1.loc[:, 'ID'].str.strip()
+    df1.loc[:, 'Delivery_person_ID'] = df1.loc[:, 'Delivery_person_ID'].str.strip()
+    df1.loc[:, 'Road_traffic_density'] = df1.loc[:, 'Road_traffic_density'].str.strip()
+    df1.loc[:, 'Type_of_order'] = df1.loc[:, 'Type_of_order'].str.strip()
+    df1.loc[:, 'Type_of_vehicle'] = df1.loc[:, 'Type_of_vehicle'].str.strip()
+    df1.loc[:, 'Festival'] = df1.loc[:, 'Festival'].str.strip()
+    df1.loc[:, 'City'] = df1.loc[:, 'City'].str.strip()
+
+    # 6. removendo dados faltantes
+    linhas_selecionadas = df1['Delivery_person_Ratings'] != 'NaN'
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+
+    linhas_selecionadas = df1['Weatherconditions'] != 'NaN'
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+
+    linhas_selecionadas = df1['Road_traffic_density'] != 'NaN'
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+
+    linhas_selecionadas = df1['City'] != 'NaN'
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+
+    linhas_selecionadas = df1['Festival'] != 'NaN'
+    df1 = df1.loc[linhas_selecionadas, :].copy()
+
+    # 7. limpando a coluna de time taken
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].apply(lambda x: x.split( '(min) ')[1])
+    df1['Time_taken(min)'] = df1['Time_taken(min)'].astype(int)
+
+    return df1
+
+
+@pytest.fixture( scope='module' )
+def raw():
+    """ Bloco sintético bruto, com os mesmos textos (e faltantes) do train.csv """
+    return next( generate( 5000, seed=7 ) )
+
+
+def test_clean_code_matches_baseline( raw ):
+    expected = baseline_clean_code( raw )
+    result = clean_code( raw )
+
+    # o bloco precisa ter linhas descartadas, senão o teste não cobre as regras de faltantes
+    assert 0 < len( result ) < len( raw )
+    pd.testing.assert_frame_equal( result, expected )
+
+
+def test_clean_code_matches_baseline_from_csv( tmp_path ):
+    path = tmp_path / 'train.csv'
+    write_csv( str( path ), 5000, seed=11 )
+    raw = pd.read_csv( path )
+
+    pd.testing.assert_frame_equal( clean_code( raw ), baseline_clean_code( raw ) )
+
+
+def test_clean_code_keeps_input( raw ):
+    before = raw.copy()
+    clean_code( raw )
+
+    pd.testing.assert_frame_equal( raw, before )
@@ -0,0 +1,64 @@
+# libraries
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import write_csv
+from dashboard.cube import DIMENSIONS, MEASURES, build_cube, merge_cubes, summarize
+from dashboard.data import build_dataset, stream_aggregates
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def sorted_cells( cube ):
+    """ Células em ordem fixa e com as dimensões em texto, para comparar cubos montados de formas diferentes """
+    cube = cube.copy()
+    for column in DIMENSIONS:
+        cube[column] = cube[column].astype( str )
+
+    return cube.sort_values( DIMENSIONS ).reset_index( drop=True )
+
+
+@pytest.fixture( scope='module' )
+def path( tmp_path_factory ):
+    """ csv sintético com os mesmos textos (e faltantes) do train.csv """
+    path = str( tmp_path_factory.mktemp( 'dataset' ) / 'train.csv' )
+    write_csv( path, 5000, seed=3 )
+    return path
+
+
+@pytest.fixture( scope='module' )
+def df1( path ):
+    return build_dataset( path )
+
+
+@pytest.mark.parametrize( 'by', [None, 'City', ['City', 'Road_traffic_density']] )
+def test_merged_moments_match_direct( df1, by ):
+    # cubo montado em pedaços e juntado, como nas partições paralelas e nos lotes
+    parts = np.array_split( np.arange( len( df1 ) ), 4 )
+    cells = merge_cubes( [build_cube( df1.iloc[part] ) for part in parts] )
+
+    for measure, column in MEASURES.items():
+        result = summarize( cells, by, measure )
+
+        if by is None:
+            expected = df1[column].agg( ['mean', 'std'] )
+            assert result.loc[0, 'mean'] == pytest.approx( expected['mean'] )
+            assert result.loc[0, 'std'] == pytest.approx( expected['std'] )
+            continue
+
+        expected = df1.groupby( by, observed=True )[column].agg( ['mean', 'std'] ).reset_index()
+        result = result.merge( expected, on=by, suffixes=( '', '_expected' ) )
+
+        assert len( result ) == len( expected )
+        np.testing.assert_allclose( result['mean'], result['mean_expected'] )
+        np.testing.assert_allclose( result['std'], result['std_expected'] )
+
+
+def test_streamed_cube_matches_in_memory( path, df1 ):
+    # blocos pequenos: o csv é lido em vários blocos e os parciais são juntados
+    streamed = stream_aggregates( path, ['cube'], max_memory_mb=0.2 )['cube']
+
+    pd.testing.assert_frame_equal( sorted_cells( streamed ), sorted_cells( build_cube( df1 ) ), check_dtype=False )
@@ -0,0 +1,58 @@
+# libraries
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate, write_csv
+from dashboard import data
+from dashboard.couriers import KEY, load_profiles
+from dashboard.cube import load_cube
+from dashboard.data import forget, load_dataset
+from dashboard.ingest import ingest_batch
+from dashboard.profiling import finish_run, start_run
+from test_cube import sorted_cells
+
+
+# ----------------------------------------------
+# Funções
+# ----------------------------------------------
+def sorted_profiles( profiles ):
+    """ Perfis em ordem fixa de linhas e colunas """
+    return profiles.sort_values( KEY ).reset_index( drop=True ).sort_index( axis=1 )
+
+
+def load_all( path ):
+    """ Valores do cache atualizados por lotes: dataset, cubo e perfis dos entregadores """
+    return load_dataset( path ), load_cube( path ), load_profiles( path )
+
+
+@pytest.fixture
+def path( tmp_path, monkeypatch ):
+    """ csv sintético num diretório próprio, fora do modo streaming """
+    monkeypatch.setattr( data, 'MAX_MEMORY_MB', None )
+
+    path = str( tmp_path / 'train.csv' )
+    write_csv( path, 3000, seed=1 )
+    yield path
+    forget( path )
+
+
+def test_update_matches_rebuild( path ):
+    load_all( path )
+    ingest_batch( next( generate( 300, seed=5 ) ), path )
+
+    run = start_run( 'test', enabled=True )
+    df1, cube, profiles = load_all( path )
+    finish_run( run )
+
+    # os valores foram atualizados só com o lote, não reconstruídos
+    stages = { record['name'] for record in run.records }
+    assert { 'update:dataset', 'update:cube', 'update:couriers' } <= stages
+    assert not any( name.startswith( 'build:' ) for name in stages )
+
+    forget( path )
+    expected_df1, expected_cube, expected_profiles = load_all( path )
+
+    pd.testing.assert_frame_equal( df1, expected_df1 )
+    pd.testing.assert_frame_equal( sorted_cells( cube ), sorted_cells( expected_cube ), check_dtype=False )
+    pd.testing.assert_frame_equal( sorted_profiles( profiles ), sorted_profiles( expected_profiles ), check_dtype=False )